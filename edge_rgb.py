@@ -1,21 +1,45 @@
 # edge_rgb_terminal.py
 
 import tkinter as tk
+import argparse
 # No ttk needed anymore
 import colorsys
 import math
 import time
 import threading
+import collections
+import multiprocessing
+from multiprocessing import shared_memory
 import json
+import logging
 import os
+import re
+import hashlib
+import mmap
+import socket
+import struct
 import sys
 import screeninfo
-# No pystray or PIL needed anymore
-import traceback # For detailed error printing
+from array import array
+try:
+    import numpy as np # Optional: vectorized effect engine, ambient mode
+except ImportError:
+    np = None
+try:
+    from PIL import Image, ImageGrab # Optional: ambient mode screen capture / image files
+except ImportError:
+    Image = None; ImageGrab = None
 
 # --- Constants ---
 SETTINGS_FILE = "edge_rgb_settings.json"
 
+# Settings that can change while running, by how much work they need (see LightingController.apply_settings)
+GEOMETRY_SETTINGS = {"thickness", "segment_len", "render_backend"} # Re-layout of the affected edge windows
+RESTART_SETTINGS = {"process_per_monitor", "monitors_per_process", "threaded_compute", "compute_buffers"} # Full restart
+CLOCK_SETTINGS = {"hue_speed", "update_ms", "max_fps", "brightness", "saturation"} # Carried by SharedClock to render processes
+APP_SETTINGS = {"settings_watch", "settings_poll_s", "monitor_watch", "monitor_poll_s", "startup_monitors", "max_restarts"} # Main process only
+# Everything else (hue_speed, brightness, saturation, update_ms, effect, ...) applies on the next frame
+
 # Default values - Monitor selection will be ignored from file/defaults now
 DEFAULT_SETTINGS = {
     "thickness": 5,
@@ -24,17 +48,1537 @@ DEFAULT_SETTINGS = {
     "brightness": 1.0,
     "saturation": 1.0,
     "segment_len": 30,
+    "max_fps": 0, # Optional frame rate cap on top of update_ms (0 = no cap); animation speed is unaffected
+    "render_backend": "rectangles", # "rectangles" (one canvas item per segment) or "image" (one PhotoImage strip per edge)
+    "batch_apply": False, # Send a whole frame's color changes to Tcl as one script instead of one call per change
+    "engine": "auto", # Color engine: "auto" (NumPy if installed), "numpy" or "python"
+    "effect": "rainbow", # "rainbow", "breathing", "chase", "gradient" (static) or "ambient" (screen colors, needs NumPy)
+    "breathing_cycles": 4, # Breaths per full hue cycle for the "breathing" effect
+    "chase_length": 0.15, # Fraction of the perimeter covered by the "chase" tail
+    "ambient_source": "screen", # Ambient mode input: "screen" (needs Pillow), "synthetic" (test pattern) or an image/.npy file path
+    "ambient_band_px": 64, # Depth of the screen band next to each edge that is averaged
+    "ambient_downsample": 4, # Use every Nth row/column of the band
+    "ambient_fps": 30, # Screen captures per second
+    "cycle_cache": False, # Render one full animation cycle once and play it back instead of recomputing frames
+    "cycle_cache_max_mb": 64, # Cycles larger than this are computed live
+    "cycle_cache_dir": "", # If set, completed cycles are saved here and memory-mapped on later runs
+    "threaded_compute": False, # Compute frames ahead on a worker thread; the Tk loop only applies them
+    "compute_buffers": 3, # Frame buffers shared with the worker (2 = double, 3 = triple buffering)
+    "process_per_monitor": False, # Render each monitor group in its own process (own Tk root), synced by a shared clock
+    "monitors_per_process": 1, # Monitors per render process when process_per_monitor is enabled
+    "max_restarts": 5, # How often a crashed render process is restarted before giving up on it
+    "startup_monitors": "", # Monitors to light without asking: "all", "primary" or e.g. "0,2" (empty = ask; --monitors overrides)
+    "layout_cache_file": "edge_rgb_layouts.json", # Segment layouts saved per monitor geometry for faster startup (empty = off)
+    "monitor_watch": True, # Follow monitors being connected, disconnected, moved or resized
+    "monitor_poll_s": 2.0, # How often the monitor list is checked
+    "settings_watch": True, # Apply edits to the settings file while running
+    "settings_poll_s": 0.5, # How often the settings file is checked for changes
+    "idle_when_static": True, # Stop the frame loop while nothing can change (hue_speed 0, brightness 0, "gradient") until settings change
+    "adaptive_fps": False, # Lower the frame rate while per-frame color changes are too small to see, raise it when motion resumes
+    "adaptive_threshold": 1.0, # Smallest per-frame change (in 0-255 channel levels) worth drawing a frame for
+    "min_fps": 5, # Lowest frame rate adaptive_fps may drop to
+    "ddp_host": "", # Also send frames to an LED controller (e.g. WLED) over UDP using DDP; empty = off
+    "ddp_port": 4048, # DDP's standard UDP port
+    "ddp_led_count": 0, # LEDs on the strip; the monitors' perimeters are resampled onto them (0 = one LED per segment)
+    "ddp_led_offset": 0, # LED at which the top-left corner of the first monitor's perimeter starts
+    "ddp_reverse": False, # Run the perimeter counter-clockwise along the strip
+    "ddp_keepalive_s": 1.0, # Resend an unchanged frame this often so the controller stays in realtime mode
+    "palette_resolution": 1536, # Hue steps in the precomputed color table (multiple of 6 keeps HSV sector edges exact)
+    "stats_interval_s": 0, # Frame-time statistics report interval in seconds (0 = stats off)
+    "stats_file": "", # Append stats as JSON lines to this file instead of printing them
+    "stats_window": 600, # Number of recent frames kept for percentile calculation
+    "log_level": "INFO", # "DEBUG" (lifecycle details), "INFO", "WARNING", "ERROR" or "CRITICAL"
+    "log_file": "", # Append log lines to this file instead of printing them
+    "log_ring_size": 0, # Keep the last N records of every level in memory and write them out only on a crash (0 = off)
     # "enabled": True, # We'll assume enabled if run
     # "selected_monitors": [0] # This will be determined at runtime
 }
 
-# --- Lighting Controller Class (Mostly Unchanged) ---
-# [Keep the LightingController class exactly as it was in the previous full code listing]
-# ... (Including __init__, stop, _shutdown_tk, run, _create_monitor_lights, _create_edge_window, _get_color, update_colors)
-# Important: Make sure the debug prints inside LightingController are still present if you want detailed logs.
+# --- Logging ---
+# All diagnostics go through the "edge_rgb" logger. Messages use lazy %-arguments, so a
+# disabled level costs one cached level check and no string formatting.
+log = logging.getLogger("edge_rgb")
+_ring_handler = None
+
+class ConsoleFormatter(logging.Formatter):
+    """Formats records like the script's prompts: plain text for INFO, 'LEVEL: message' otherwise."""
+    def format(self, record):
+        message = super().format(record)
+        return message if record.levelno == logging.INFO else f"{record.levelname}: {message}"
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last 'capacity' records of every level in memory; dump() writes them out after a crash."""
+    def __init__(self, capacity):
+        super().__init__(logging.DEBUG)
+        self.records = collections.deque(maxlen=capacity)
+        self.setFormatter(logging.Formatter("%(asctime)s %(threadName)s %(levelname)s: %(message)s"))
+
+    def emit(self, record):
+        self.records.append(record) # Formatted only if it is ever dumped
+
+    def dump(self, stream, reason):
+        records = list(self.records); self.records.clear()
+        if not records: return
+        stream.write(f"--- Last {len(records)} log records ({reason}) ---\n")
+        for record in records: stream.write(self.format(record) + "\n")
+        stream.write("--- End of log records ---\n"); stream.flush()
+
+class RateLimitedLog:
+    """Logs a repeating message at most once per interval per key, reporting how many were suppressed."""
+    def __init__(self, logger, interval_s=10.0):
+        self.logger = logger; self.interval_s = interval_s
+        self.last = {}; self.suppressed = {}
+
+    def log(self, key, level, msg, *args, exc_info=False):
+        now = time.monotonic()
+        last = self.last.get(key)
+        if last is not None and now - last < self.interval_s:
+            self.suppressed[key] = self.suppressed.get(key, 0) + 1; return False
+        suppressed = self.suppressed.pop(key, 0)
+        if suppressed: msg += f" ({suppressed} similar messages suppressed)"
+        self.last[key] = now
+        self.logger.log(level, msg, *args, exc_info=exc_info)
+        return True
+
+limited_log = RateLimitedLog(log)
+
+def configure_logging(settings):
+    """(Re)configures the "edge_rgb" logger from the log_* settings."""
+    global _ring_handler
+    level = getattr(logging, str(settings.get("log_level", "INFO")).upper(), None)
+    if not isinstance(level, int): level = logging.INFO
+    for handler in list(log.handlers):
+        log.removeHandler(handler)
+        if handler is not _ring_handler: handler.close()
+    handler = None; path = settings.get("log_file", "")
+    if path:
+        try: handler = logging.FileHandler(path, encoding="utf-8")
+        except OSError as e: print(f"WARNING: Could not open log file '{path}' ({e}), logging to the console.")
+    if handler is None: handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(processName)s %(threadName)s %(levelname)s: %(message)s")
+                         if isinstance(handler, logging.FileHandler) else ConsoleFormatter())
+    handler.setLevel(level); log.addHandler(handler)
+    ring_size = max(0, int(settings.get("log_ring_size", 0) or 0))
+    if ring_size:
+        previous = _ring_handler
+        _ring_handler = RingBufferHandler(ring_size)
+        if previous: _ring_handler.records.extend(previous.records)
+        log.addHandler(_ring_handler)
+    else:
+        _ring_handler = None
+    # Lower records are only created when the ring buffer keeps them
+    log.setLevel(logging.DEBUG if _ring_handler else level); log.propagate = False
+
+def dump_crash_log(reason):
+    """Writes the ring buffer's records to the log output (or stderr) after a crash; no-op without a ring buffer."""
+    if not _ring_handler: return
+    stream = next((h.stream for h in log.handlers if isinstance(h, logging.StreamHandler) and h is not _ring_handler), sys.stderr)
+    try: _ring_handler.dump(stream, reason)
+    except Exception: pass
+
+# --- Hue Palette (Precomputed Color Table) ---
+
+class HuePalette:
+    """Quantized hue -> packed 0xRRGGBB lookup table for a fixed saturation/brightness.
+
+    Built once per (saturation, brightness, resolution); the frame loop then only
+    needs an integer index and a list read per segment instead of a colorsys call.
+    """
+    def __init__(self, saturation, brightness, resolution):
+        self.saturation = max(0.0, min(1.0, saturation))
+        self.brightness = max(0.0, min(1.0, brightness))
+        self.resolution = max(1, int(resolution))
+        self.key = (self.saturation, self.brightness, self.resolution)
+        self.rgb = [] # Packed 0xRRGGBB ints, one per hue step
+        for step in range(self.resolution):
+            r, g, b = colorsys.hsv_to_rgb(step / self.resolution, self.saturation, self.brightness)
+            self.rgb.append((int(r*255) << 16) | (int(g*255) << 8) | int(b*255))
+
+    @staticmethod
+    def key_for(settings):
+        """Returns the cache key a palette built from these settings would have."""
+        return (max(0.0, min(1.0, settings.get("saturation", 1.0))),
+                max(0.0, min(1.0, settings.get("brightness", 1.0))),
+                max(1, int(settings.get("palette_resolution", DEFAULT_SETTINGS["palette_resolution"]))))
+
+# --- Edge Strip (Single-Image Render Backend) ---
+
+class EdgeStrip:
+    """One PhotoImage covering a whole edge window, repainted with a single put() per frame.
+
+    The image is edge-sized; each frame we send one row (horizontal edges) or one
+    column (vertical edges) of per-pixel colors and let Tk tile it across the
+    thickness via put's -to option, so the cost is one Tcl call per edge.
+    """
+    def __init__(self, image, vertical, width, height, runs, name=None):
+        self.image = image
+        self.name = image.name if image is not None else name # Tcl image name (used in batched scripts)
+        self.vertical = vertical
+        self.width = width; self.height = height
+        self.runs = runs # Pixel length of each segment along the edge, in list order
+        self.to = (0, 0, width, height)
+
+    @staticmethod
+    def segment_runs(num_segments, seg_size, edge_length):
+        """Pixel run length per segment, using the same floor() boundaries as the rectangle backend."""
+        bounds = [math.floor(i * seg_size) for i in range(num_segments)] + [edge_length]
+        return [max(1, bounds[i + 1] - bounds[i]) for i in range(num_segments)]
+
+    def build_data(self, colors):
+        """Tk image data for one strip row/column from per-segment colors (list order)."""
+        if self.vertical:
+            return ''.join(f'{{{c}}} ' * n for c, n in zip(colors, self.runs))
+        return '{' + ''.join(f'{c} ' * n for c, n in zip(colors, self.runs)) + '}'
+
+    def paint(self, colors):
+        self.image.put(self.build_data(colors), to=self.to)
+
+    def paint_command(self, colors):
+        """Same as paint(), as a Tcl command line for a batched frame script."""
+        return f"{self.name} put {{{self.build_data(colors)}}} -to 0 0 {self.width} {self.height}"
+
+# --- Frame Scheduler (Time-Based, Drift-Free) ---
+
+class FrameScheduler:
+    """Schedules frames against absolute deadlines and derives hue from wall-clock time.
+
+    Hue advances at a fixed number of cycles per second, so the animation speed does
+    not depend on how long frames take. When a frame overruns, the missed deadlines
+    are dropped instead of being replayed late, and timing error never accumulates.
+    """
+    def __init__(self, interval_s, hue_rate, clock=time.perf_counter):
+        self.clock = clock
+        self.interval = max(0.001, interval_s) # Seconds between frame deadlines
+        self.base_interval = self.interval # Configured interval; 'interval' may be stretched by adaptive_fps
+        self.hue_rate = hue_rate # Hue cycles per second
+        self.epoch = None; self.phase = 0.0 # hue = phase + (t - epoch) * hue_rate
+        self.deadline = None # Absolute time the current frame was due
+        self.dropped_frames = 0
+
+    @staticmethod
+    def from_settings(settings, clock=time.perf_counter):
+        return FrameScheduler(*FrameScheduler.timing_from_settings(settings), clock=clock)
+
+    @staticmethod
+    def timing_from_settings(settings):
+        """Returns (frame interval in s, hue cycles per s) for a settings dict.
+
+        hue_speed keeps its meaning of "hue advanced per update_ms", it is just
+        converted to a rate; max_fps can only lengthen the interval.
+        """
+        update_s = max(1, settings.get("update_ms", 15)) / 1000.0
+        interval = update_s
+        max_fps = settings.get("max_fps", 0) or 0
+        if max_fps > 0: interval = max(interval, 1.0 / max_fps)
+        return interval, settings.get("hue_speed", 0.005) / update_s
+
+    def start(self, now=None, phase=0.0):
+        now = self.clock() if now is None else now
+        self.epoch = now; self.phase = phase; self.deadline = now
+
+    def hue_at(self, now):
+        return (self.phase + (now - self.epoch) * self.hue_rate) % 1.0
+
+    def configure(self, interval_s, hue_rate, now=None):
+        """Changes timing without a jump in hue (the phase is rebased to 'now')."""
+        now = self.clock() if now is None else now
+        if self.epoch is not None and hue_rate != self.hue_rate:
+            self.phase = self.hue_at(now); self.epoch = now
+        self.hue_rate = hue_rate
+        self.interval = self.base_interval = max(0.001, interval_s)
+
+    def resume(self, now=None):
+        """Restarts deadlines at 'now' after the loop was suspended (hue keeps following the clock)."""
+        self.deadline = self.clock() if now is None else now
+
+    def lateness(self, now):
+        """How far behind its deadline a frame started, in seconds."""
+        return max(0.0, now - self.deadline)
+
+    def advance(self, now):
+        """Moves to the next deadline after 'now'. Returns (delay_ms for after(), frames dropped)."""
+        self.deadline += self.interval
+        dropped = 0
+        if now >= self.deadline:
+            dropped = int((now - self.deadline) / self.interval) + 1
+            self.deadline += dropped * self.interval
+            self.dropped_frames += dropped
+        return max(1, int(round((self.deadline - now) * 1000))), dropped
+
+# --- Frame Statistics ---
+
+class FrameStats:
+    """Fixed-size ring buffer of per-frame timings with periodic percentile reports.
+
+    Times are recorded in milliseconds: compute (color calculation), apply (Tcl/Tk
+    calls) and lateness (how far behind its deadline the frame started). Reports go
+    to the terminal or, if a path is given, are appended to a JSON-lines file.
+    """
+    def __init__(self, capacity=600, interval_s=5.0, path=None, frame_interval_s=0.015):
+        self.capacity = max(1, int(capacity))
+        self.interval_s = interval_s
+        self.path = path or None
+        self.frame_interval_ms = frame_interval_s * 1000
+        self.compute_ms = array('d', [0.0]) * self.capacity
+        self.apply_ms = array('d', [0.0]) * self.capacity
+        self.late_ms = array('d', [0.0]) * self.capacity
+        self.pos = 0; self.count = 0
+        self.frames = 0; self.dropped = 0; self.overruns = 0 # Since last report
+        self.updates = 0; self.skips = 0 # Segment colors sent vs. skipped as unchanged, since last report
+        self.polls = 0; self.poll_ms_total = 0.0; self.poll_ms_max = 0.0 # Monitor hotplug polling (CPU ms), since last report
+        self.poll_interval_s = 0.0
+        self.sends = 0; self.send_ms_total = 0.0; self.send_ms_max = 0.0 # Network LED output, since last report
+        self.captures = 0; self.capture_ms_total = 0.0; self.capture_ms_max = 0.0 # Ambient capture-to-paint latency, since last report
+        self.last_report = time.perf_counter()
+
+    @staticmethod
+    def from_settings(settings):
+        """Returns a FrameStats for these settings, or None when stats are disabled."""
+        interval_s = settings.get("stats_interval_s", 0) or 0
+        if interval_s <= 0: return None
+        frame_interval_s, _ = FrameScheduler.timing_from_settings(settings)
+        return FrameStats(settings.get("stats_window", 600), interval_s, settings.get("stats_file", ""), frame_interval_s)
+
+    def record(self, compute_ms, apply_ms, late_ms, dropped):
+        i = self.pos
+        self.compute_ms[i] = compute_ms; self.apply_ms[i] = apply_ms; self.late_ms[i] = late_ms
+        self.pos = (i + 1) % self.capacity
+        if self.count < self.capacity: self.count += 1
+        self.frames += 1; self.dropped += dropped
+        if compute_ms + apply_ms > self.frame_interval_ms: self.overruns += 1
+
+    def record_changes(self, updates, skips):
+        """Records how many segment colors a frame sent to Tk and how many it skipped as unchanged."""
+        self.updates += updates; self.skips += skips
+
+    def record_poll(self, poll_ms, interval_s=0.0):
+        """Records the CPU time of one monitor-list poll and the poll interval (called from the MonitorWatcher thread)."""
+        self.polls += 1; self.poll_ms_total += poll_ms; self.poll_interval_s = interval_s
+        if poll_ms > self.poll_ms_max: self.poll_ms_max = poll_ms
+
+    def record_send(self, send_ms):
+        """Records the time one frame took to go out to the network LED output."""
+        self.sends += 1; self.send_ms_total += send_ms
+        if send_ms > self.send_ms_max: self.send_ms_max = send_ms
+
+    def record_capture(self, latency_ms):
+        """Records how long an ambient screen capture took to reach the screen edges."""
+        self.captures += 1; self.capture_ms_total += latency_ms
+        if latency_ms > self.capture_ms_max: self.capture_ms_max = latency_ms
+
+    @staticmethod
+    def _percentiles(values):
+        ordered = sorted(values)
+        if not ordered: return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+        last = len(ordered) - 1
+        return {f"p{q}": round(ordered[min(last, int(last * q / 100 + 0.5))], 3) for q in (50, 95, 99)}
+
+    def snapshot(self, now=None):
+        """Summary of the ring buffer plus the counters since the last report."""
+        now = time.perf_counter() if now is None else now
+        n = self.count; elapsed = max(1e-9, now - self.last_report)
+        return {
+            "time": round(time.time(), 3),
+            "frames": self.frames, "fps": round(self.frames / elapsed, 2),
+            "dropped": self.dropped, "overruns": self.overruns,
+            "compute_ms": self._percentiles(self.compute_ms[:n]),
+            "apply_ms": self._percentiles(self.apply_ms[:n]),
+            "late_ms": self._percentiles(self.late_ms[:n]),
+            "segment_updates": self.updates, "segment_skips": self.skips,
+            "updates_per_frame": round(self.updates / self.frames, 1) if self.frames else 0.0,
+            "skipped_pct": round(100.0 * self.skips / (self.updates + self.skips), 1) if self.updates + self.skips else 0.0,
+            "monitor_polls": self.polls, "monitor_poll_s": self.poll_interval_s,
+            "monitor_poll_cpu_ms": {"mean": round(self.poll_ms_total / self.polls, 3) if self.polls else 0.0, "max": round(self.poll_ms_max, 3)},
+            "led_sends": self.sends,
+            "led_send_ms": {"mean": round(self.send_ms_total / self.sends, 3) if self.sends else 0.0, "max": round(self.send_ms_max, 3)},
+            "ambient_captures": self.captures,
+            "capture_to_paint_ms": {"mean": round(self.capture_ms_total / self.captures, 3) if self.captures else 0.0, "max": round(self.capture_ms_max, 3)},
+        }
+
+    def maybe_report(self, now):
+        if now - self.last_report >= self.interval_s: self.report(now)
+
+    def report(self, now=None):
+        now = time.perf_counter() if now is None else now
+        snap = self.snapshot(now)
+        if self.path:
+            try:
+                with open(self.path, 'a') as f: f.write(json.dumps(snap) + "\n")
+            except Exception as e:
+                log.error("FrameStats.report() - Could not write '%s': %s", self.path, e)
+        else:
+            c, a, l = snap["compute_ms"], snap["apply_ms"], snap["late_ms"]
+            fmt = "STATS: no frames"; args = [] # Formatted by logging only if INFO is enabled
+            if self.count:
+                fmt = ("STATS: %.1f fps, %s dropped, %s overruns | compute p50/p95/p99 %s/%s/%s ms | apply %s/%s/%s ms | "
+                       "late %s/%s/%s ms | updates %s/frame (%s%% skipped)")
+                args = [snap['fps'], snap['dropped'], snap['overruns'], c['p50'], c['p95'], c['p99'], a['p50'], a['p95'], a['p99'],
+                        l['p50'], l['p95'], l['p99'], snap['updates_per_frame'], snap['skipped_pct']]
+            if snap['monitor_polls']:
+                fmt += " | monitor polls %s every %s s (CPU mean %s ms, max %s ms)"
+                args += [snap['monitor_polls'], snap['monitor_poll_s'], snap['monitor_poll_cpu_ms']['mean'], snap['monitor_poll_cpu_ms']['max']]
+            if snap['led_sends']:
+                fmt += " | LED sends %s (mean %s ms, max %s ms)"
+                args += [snap['led_sends'], snap['led_send_ms']['mean'], snap['led_send_ms']['max']]
+            if snap['ambient_captures']:
+                fmt += " | captures %s (capture-to-paint mean %s ms, max %s ms)"
+                args += [snap['ambient_captures'], snap['capture_to_paint_ms']['mean'], snap['capture_to_paint_ms']['max']]
+            log.info(fmt, *args)
+        self.frames = 0; self.dropped = 0; self.overruns = 0; self.updates = 0; self.skips = 0
+        self.polls = 0; self.poll_ms_total = 0.0; self.poll_ms_max = 0.0
+        self.sends = 0; self.send_ms_total = 0.0; self.send_ms_max = 0.0
+        self.captures = 0; self.capture_ms_total = 0.0; self.capture_ms_max = 0.0
+        self.last_report = now
+        return snap
+
+# --- Headless Render Core (Layout, Frame Generation, Sinks) ---
+# Nothing in this section touches Tk or screeninfo, so it can be benchmarked and
+# exercised on machines without a display (see edge_rgb_bench.py).
+
+class FakeMonitor:
+    """Stand-in for screeninfo.Monitor (same attribute names) for headless runs and benchmarks."""
+    def __init__(self, x, y, width, height, name=None, is_primary=False):
+        self.x = x; self.y = y
+        self.width = width; self.height = height
+        self.name = name; self.is_primary = is_primary
+
+    def __repr__(self):
+        return f"FakeMonitor({self.name}, {self.width}x{self.height}@{self.x},{self.y})"
+
+def monitor_identity(monitor):
+    """Stable identity of a physical monitor: its name, or its top-left corner when it has none (survives a resolution change)."""
+    return getattr(monitor, 'name', None) or f"{monitor.x},{monitor.y}"
+
+def monitor_key(monitor):
+    """Identity plus geometry; two monitor lists are equivalent when their keys are."""
+    return (monitor_identity(monitor), monitor.x, monitor.y, monitor.width, monitor.height)
+
+def fake_monitors(count, width=1920, height=1080):
+    """Returns 'count' FakeMonitors placed side by side, the first one primary."""
+    return [FakeMonitor(i * width, 0, width, height, name=f"FAKE{i}", is_primary=(i == 0)) for i in range(count)]
+
+class EdgeLayout:
+    """Geometry of one edge window: window geometry string, segment rectangles and pixel runs.
+
+    Segments are stored in list order (left->right / top->bottom). 'order' maps each
+    list position to its index in the monitor's clockwise perimeter order.
+    """
+    def __init__(self, name, geometry, orientation, count, seg_w, seg_h, width, height, start, reverse):
+        self.name = name; self.geometry = geometry; self.orientation = orientation
+        self.count = count; self.seg_w = seg_w; self.seg_h = seg_h
+        self.width = width; self.height = height
+        self.start = start; self.reverse = reverse
+        self.order = [start + ((count - 1 - j) if reverse else j) for j in range(count)]
+        self.rects = []
+        for i in range(count):
+            if orientation == 'horizontal': x1, y1, x2, y2 = i * seg_w, 0, (i + 1) * seg_w, seg_h
+            else: x1, y1, x2, y2 = 0, i * seg_h, seg_w, (i + 1) * seg_h
+            x1, y1, x2, y2 = map(math.floor, [x1, y1, x2, y2])
+            self.rects.append((x1, y1, max(x1 + 1, x2), max(y1 + 1, y2)))
+        if orientation == 'horizontal': self.runs = EdgeStrip.segment_runs(count, seg_w, width)
+        else: self.runs = EdgeStrip.segment_runs(count, seg_h, height)
+
+    FIELDS = ("name", "geometry", "orientation", "count", "seg_w", "seg_h", "width", "height", "start", "reverse", "rects", "runs")
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @staticmethod
+    def from_dict(data):
+        """Rebuilds an EdgeLayout from to_dict() output without recomputing its rectangles."""
+        edge = EdgeLayout.__new__(EdgeLayout)
+        for field in EdgeLayout.FIELDS: setattr(edge, field, data[field])
+        edge.rects = [tuple(rect) for rect in edge.rects]
+        edge.order = [edge.start + ((edge.count - 1 - j) if edge.reverse else j) for j in range(edge.count)]
+        return edge
+
+class MonitorLayout:
+    """Perimeter layout of one monitor: four EdgeLayouts in clockwise order (top, right, bottom, left)."""
+    def __init__(self, monitor, thickness, seg_len):
+        m_width = monitor.width; m_height = monitor.height
+        m_x = monitor.x; m_y = monitor.y
+        seg_len = max(1, seg_len)
+        self.x = m_x; self.y = m_y; self.width = m_width; self.height = m_height
+        self.thickness = thickness; self.segment_len = seg_len
+
+        self.segments_h = segments_h = max(1, m_width // seg_len)
+        self.segments_v = segments_v = max(1, m_height // seg_len)
+        self.total_segments = 2 * segments_h + 2 * segments_v
+        self.seg_width = seg_width = m_width / segments_h if segments_h > 0 else m_width
+        self.seg_height = seg_height = m_height / segments_v if segments_v > 0 else m_height
+        self.hue_fractions = array('d', [n / self.total_segments for n in range(self.total_segments)]) # Position of each segment along the perimeter
+
+        self.edges = [
+            EdgeLayout('top', f"{m_width}x{thickness}+{m_x}+{m_y}", 'horizontal', segments_h, seg_width, thickness, m_width, thickness, 0, False),
+            EdgeLayout('right', f"{thickness}x{m_height}+{m_x + m_width - thickness}+{m_y}", 'vertical', segments_v, thickness, seg_height, thickness, m_height, segments_h, False),
+            EdgeLayout('bottom', f"{m_width}x{thickness}+{m_x}+{m_y + m_height - thickness}", 'horizontal', segments_h, seg_width, thickness, m_width, thickness, segments_h + segments_v, True),
+            EdgeLayout('left', f"{thickness}x{m_height}+{m_x}+{m_y}", 'vertical', segments_v, thickness, seg_height, thickness, m_height, 2 * segments_h + segments_v, True),
+        ]
+
+    FIELDS = ("x", "y", "width", "height", "thickness", "segment_len", "segments_h", "segments_v", "total_segments", "seg_width", "seg_height")
+
+    def to_dict(self):
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        data["edges"] = [edge.to_dict() for edge in self.edges]
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        layout = MonitorLayout.__new__(MonitorLayout)
+        for field in MonitorLayout.FIELDS: setattr(layout, field, data[field])
+        layout.hue_fractions = array('d', [n / layout.total_segments for n in range(layout.total_segments)])
+        layout.edges = [EdgeLayout.from_dict(edge) for edge in data["edges"]]
+        return layout
+
+class LayoutCache:
+    """MonitorLayouts persisted as JSON, keyed by monitor geometry, thickness and segment_len.
+
+    Lets a restart (or a render process) skip recomputing segment rectangles for
+    monitors it has seen before. Each layout is stored as its own JSON string, so
+    opening the file only decodes the layouts actually used. The file is rewritten
+    atomically by save(), and only if a layout was added; unreadable files are
+    ignored and rebuilt.
+    """
+    VERSION = 2
+    MAX_ENTRIES = 32
+
+    def __init__(self, path):
+        self.path = path; self.entries = {}; self.dirty = False
+        self.hits = 0; self.misses = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f: data = json.load(f)
+                if data.get("version") == self.VERSION: self.entries = data.get("layouts", {})
+            except Exception as e:
+                log.warning("LayoutCache - Ignoring unreadable '%s': %s", path, e)
+
+    @staticmethod
+    def key_for(monitor, thickness, seg_len):
+        return f"{monitor.x},{monitor.y},{monitor.width},{monitor.height},{thickness},{max(1, seg_len)}"
+
+    def get(self, monitor, thickness, seg_len):
+        """Returns the MonitorLayout for these parameters, from the cache if possible."""
+        key = self.key_for(monitor, thickness, seg_len)
+        data = self.entries.get(key)
+        if data is not None:
+            try:
+                layout = MonitorLayout.from_dict(json.loads(data)); self.hits += 1
+                return layout
+            except (KeyError, TypeError, ValueError) as e:
+                log.warning("LayoutCache - Bad entry %s, rebuilding: %s", key, e)
+        layout = MonitorLayout(monitor, thickness, seg_len); self.misses += 1
+        self.entries.pop(key, None); self.entries[key] = json.dumps(layout.to_dict(), separators=(',', ':')) # Newest last, so trimming drops the oldest
+        while len(self.entries) > self.MAX_ENTRIES: del self.entries[next(iter(self.entries))]
+        self.dirty = True
+        return layout
+
+    def save(self):
+        if not self.dirty or not self.path: return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f: json.dump({"version": self.VERSION, "layouts": self.entries}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path) # Atomic, so concurrent render processes never see a half-written file
+            self.dirty = False
+        except Exception as e:
+            log.error("LayoutCache.save() - Could not write '%s': %s", self.path, e)
+
+class FrameGenerator:
+    """Computes one frame of packed 0xRRGGBB colors per monitor, in perimeter order.
+
+    The output arrays are allocated once per monitor and overwritten every frame.
+    Effects are functions of the hue offset only, so every effect repeats with the
+    hue cycle. With NumPy available (engine "auto"/"numpy") all monitors are
+    computed in one vectorized pass by NumpyEffectEngine; otherwise the pure-Python
+    loops below are used.
+    """
+    def __init__(self, settings):
+        self.settings = settings
+        self.layouts = {}
+        self.frame = {} # monitor_index -> array('l') of packed RGB, one entry per perimeter segment
+        self._palette = None
+        self._engine = None; self._engine_dirty = True; self._numpy_warned = False
+        self._cycle_cache = None; self._cycle_cache_key = None
+        self._ambient = None; self._ambient_key = None # (FrameSource, AmbientReducer) for the "ambient" effect
+        self._layout_version = 0 # Bumped whenever monitors are added/removed (invalidates the cycle cache)
+
+    def add_monitor(self, monitor_index, layout):
+        self.layouts[monitor_index] = layout
+        self.frame[monitor_index] = array('l', [0]) * layout.total_segments
+        self._engine_dirty = True; self._layout_version += 1
+
+    def remove_monitor(self, monitor_index):
+        self.layouts.pop(monitor_index, None); self.frame.pop(monitor_index, None)
+        self._engine_dirty = True; self._layout_version += 1
+
+    def get_palette(self):
+        """Returns the current HuePalette, rebuilding it only if the relevant settings changed."""
+        key = HuePalette.key_for(self.settings)
+        if self._palette is None or self._palette.key != key:
+            self._palette = HuePalette(*key)
+            log.debug("FrameGenerator.get_palette() - Built palette (sat=%s, bri=%s, steps=%s).", key[0], key[1], key[2])
+        return self._palette
+
+    def get_engine(self):
+        """Returns the NumpyEffectEngine to use, or None for the pure-Python path."""
+        engine_setting = self.settings.get("engine", "auto")
+        want_numpy = engine_setting == "numpy" or (engine_setting == "auto" and np is not None)
+        if not want_numpy or np is None:
+            if want_numpy and not self._numpy_warned:
+                log.warning("FrameGenerator - engine 'numpy' requested but NumPy is not installed. Using the Python engine.")
+                self._numpy_warned = True
+            self._engine = None
+            return None
+        if self._engine_dirty or self._engine is None:
+            self._engine = NumpyEffectEngine(self.frame)
+            self._engine_dirty = False
+        return self._engine
+
+    def get_ambient(self):
+        """Returns (FrameSource, AmbientReducer) for the current layouts and settings, or None if ambient mode is unavailable."""
+        settings = self.settings
+        key = (self._layout_version, settings.get("ambient_source", "screen"), settings.get("ambient_band_px", 64), settings.get("ambient_downsample", 4))
+        if key != self._ambient_key:
+            self._ambient_key = key; self._ambient = None
+            source = frame_source_from_settings(settings)
+            if source is not None:
+                self._ambient = (source, AmbientReducer(self.layouts, settings.get("ambient_band_px", 64), settings.get("ambient_downsample", 4)))
+        return self._ambient
+
+    def get_cycle_cache(self):
+        """Returns the CycleCache for the current settings/layouts, or None to compute live."""
+        settings = self.settings
+        if not settings.get("cycle_cache", False) or settings.get("effect") == "ambient": # Screen colors never repeat
+            if self._cycle_cache is not None: self._cycle_cache.close(); self._cycle_cache = None; self._cycle_cache_key = None
+            return None
+        effect = settings.get("effect", "rainbow")
+        interval, hue_rate = FrameScheduler.timing_from_settings(settings)
+        quick_key = (self._layout_version, effect, interval, hue_rate, HuePalette.key_for(settings),
+                     settings.get("breathing_cycles"), settings.get("chase_length"),
+                     settings.get("cycle_cache_max_mb"), settings.get("cycle_cache_dir"))
+        if quick_key == self._cycle_cache_key: return self._cycle_cache
+        if self._cycle_cache is not None: self._cycle_cache.close()
+        self._cycle_cache = None; self._cycle_cache_key = quick_key
+
+        # One frame per cycle for the static gradient, otherwise one per frame interval of hue movement
+        if effect == "gradient": frames_per_cycle = 1
+        elif hue_rate > 0: frames_per_cycle = max(1, round(1.0 / (hue_rate * interval)))
+        else: return None # Hue frozen at an arbitrary phase: nothing periodic to cache
+        segment_counts = [(index, len(colors)) for index, colors in self.frame.items()]
+        frame_size = sum(count for _, count in segment_counts)
+        size_mb = CycleCache.size_bytes(frames_per_cycle, frame_size) / (1024 * 1024)
+        if size_mb > settings.get("cycle_cache_max_mb", 64):
+            log.debug("FrameGenerator - Cycle of %s frames (%.1f MB) exceeds cycle_cache_max_mb, computing live.", frames_per_cycle, size_mb)
+            return None
+
+        key = {"effect": effect, "frames": frames_per_cycle, "palette": list(HuePalette.key_for(settings)),
+               "breathing_cycles": settings.get("breathing_cycles"), "chase_length": settings.get("chase_length"),
+               "byteorder": sys.byteorder,
+               "monitors": [[self.layouts[i].width, self.layouts[i].height, self.layouts[i].segments_h, self.layouts[i].segments_v] for i, _ in segment_counts]}
+        cache_dir = settings.get("cycle_cache_dir", "")
+        path = os.path.join(cache_dir, f"cycle_{CycleCache.digest_for(key).hex()}.bin") if cache_dir else None
+        self._cycle_cache = CycleCache(key, frames_per_cycle, segment_counts, path)
+        log.debug("FrameGenerator - Cycle cache active: %s frames x %s segments (%.1f MB).", frames_per_cycle, frame_size, size_mb)
+        return self._cycle_cache
+
+    def compute(self, hue_offset):
+        cycle_cache = self.get_cycle_cache()
+        if cycle_cache is not None: return cycle_cache.frame_for(hue_offset, self.compute_live)
+        return self.compute_live(hue_offset)
+
+    def compute_live(self, hue_offset):
+        effect = self.settings.get("effect", "rainbow")
+        if effect == "ambient":
+            ambient = self.get_ambient()
+            if ambient is not None:
+                ambient[1].sample(ambient[0], self.frame, self.settings.get("brightness", 1.0))
+                return self.frame
+            effect = "rainbow"
+        palette = self.get_palette()
+        engine = self.get_engine()
+        if engine is not None:
+            engine.compute(effect, hue_offset, palette, self.settings)
+            return self.frame
+        if effect == "breathing": self._compute_breathing(hue_offset, palette)
+        elif effect == "chase": self._compute_chase(hue_offset, palette)
+        else: self._compute_rainbow(0.0 if effect == "gradient" else hue_offset, palette)
+        return self.frame
+
+    def _compute_rainbow(self, hue_offset, palette):
+        rgb_table = palette.rgb; steps = palette.resolution
+        # Table index of segment n is floor((offset + n/total) * steps) mod steps
+        for monitor_index, colors in self.frame.items():
+            fractions = self.layouts[monitor_index].hue_fractions
+            for n in range(len(colors)):
+                colors[n] = rgb_table[int((hue_offset + fractions[n]) * steps) % steps]
+
+    def _compute_breathing(self, hue_offset, palette):
+        # Whole perimeter shows one slowly cycling hue whose brightness pulses breathing_cycles times per hue cycle
+        level = breathing_level(hue_offset, self.settings)
+        color = hsv_to_packed(hue_offset, palette.saturation, palette.brightness * level)
+        for colors in self.frame.values():
+            for n in range(len(colors)): colors[n] = color
+
+    def _compute_chase(self, hue_offset, palette):
+        # A rainbow-colored head runs around each perimeter once per hue cycle, fading out over chase_length
+        length = chase_length(self.settings)
+        sat = palette.saturation; bri = palette.brightness
+        for monitor_index, colors in self.frame.items():
+            fractions = self.layouts[monitor_index].hue_fractions
+            for n in range(len(colors)):
+                pos = fractions[n]
+                distance = (hue_offset - pos) % 1.0
+                colors[n] = hsv_to_packed(hue_offset + pos, sat, bri * (1.0 - distance / length)) if distance < length else 0
+
+# --- Cycle Cache (Precomputed Animation Period) ---
+
+class CycleCache:
+    """One full hue cycle of rendered frames, played back by index instead of recomputed.
+
+    Every effect is a function of the hue offset, so with frames_per_cycle frames the
+    animation repeats exactly. Slots are filled lazily: the first time a slot is
+    needed it is computed live (at the slot's quantized hue) and stored, so there is
+    no startup stall and after one cycle nothing is recomputed. Colors are stored as
+    array('I') (4 bytes per segment). With a cache directory, a completed cycle is
+    written to disk and later runs/identical machines map the file read-only.
+    """
+    MAGIC = b'ERGBCYC1'
+    HEADER = struct.Struct('<8sII16s') # magic, frames, segments per frame, key digest
+
+    def __init__(self, key, frames_per_cycle, segment_counts, path=None):
+        self.key = key; self.digest = CycleCache.digest_for(key)
+        self.frames_per_cycle = frames_per_cycle
+        self.segment_counts = segment_counts # [(monitor_index, segment count)] in frame order
+        self.frame_size = sum(count for _, count in segment_counts)
+        self.path = path
+        self._mmap = None
+        self.storage = None
+        if path: self._load(path)
+        if self.storage is None:
+            self.storage = array('I', [0]) * (self.frame_size * frames_per_cycle)
+            self.filled = bytearray(frames_per_cycle); self.remaining = frames_per_cycle
+        self.view = memoryview(self.storage) if not self._mmap else self.storage
+
+    @staticmethod
+    def digest_for(key):
+        return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).digest()[:16]
+
+    @staticmethod
+    def size_bytes(frames_per_cycle, frame_size):
+        return frames_per_cycle * frame_size * array('I').itemsize
+
+    def _load(self, path):
+        try:
+            with open(path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, frames, size, digest = CycleCache.HEADER.unpack_from(mm)
+            if magic != CycleCache.MAGIC or frames != self.frames_per_cycle or size != self.frame_size or digest != self.digest \
+                    or len(mm) != CycleCache.HEADER.size + CycleCache.size_bytes(frames, size):
+                log.debug("CycleCache - Ignoring stale cache file '%s'.", path)
+                mm.close(); return
+            self._mmap = mm
+            self.storage = memoryview(mm)[CycleCache.HEADER.size:].cast('I')
+            self.filled = None; self.remaining = 0
+            log.debug("CycleCache - Mapped %s cached frames from '%s'.", frames, path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log.warning("CycleCache - Could not map cache file '%s': %s", path, e)
+
+    def _save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(CycleCache.HEADER.pack(CycleCache.MAGIC, self.frames_per_cycle, self.frame_size, self.digest))
+                self.storage.tofile(f)
+            os.replace(tmp_path, self.path) # Atomic, so concurrent runs never see a half-written file
+            log.debug("CycleCache - Saved %s frames to '%s'.", self.frames_per_cycle, self.path)
+        except Exception as e:
+            log.warning("CycleCache - Could not save cache file '%s': %s", self.path, e)
+            try: os.remove(tmp_path)
+            except OSError: pass
+
+    def frame_for(self, hue_offset, compute_live):
+        """Returns the cached frame nearest below hue_offset; compute_live(hue) fills empty slots."""
+        slot = int((hue_offset % 1.0) * self.frames_per_cycle) % self.frames_per_cycle
+        base = slot * self.frame_size
+        if self.filled is not None and not self.filled[slot]:
+            live = compute_live(slot / self.frames_per_cycle)
+            offset = base
+            for monitor_index, count in self.segment_counts:
+                self.storage[offset:offset + count] = array('I', live[monitor_index]); offset += count
+            self.filled[slot] = 1; self.remaining -= 1
+            if self.remaining == 0 and self.path: self._save()
+        frame = {}; offset = base
+        for monitor_index, count in self.segment_counts:
+            frame[monitor_index] = self.view[offset:offset + count]; offset += count
+        return frame
+
+    def close(self):
+        view = self.view; self.view = None; self.storage = None
+        if self._mmap is not None:
+            try:
+                if view is not None: view.release()
+                self._mmap.close()
+            except BufferError:
+                pass # A frame slice is still referenced somewhere; the mapping is released when it is collected
+            self._mmap = None
+
+# --- Effect Helpers ---
+
+EFFECTS = ("rainbow", "breathing", "chase", "gradient", "ambient")
+
+def hsv_to_packed(hue, saturation, value):
+    """colorsys.hsv_to_rgb packed into a 0xRRGGBB int (channels truncated like HuePalette)."""
+    r, g, b = colorsys.hsv_to_rgb(hue % 1.0, saturation, max(0.0, value))
+    return (int(r*255) << 16) | (int(g*255) << 8) | int(b*255)
+
+def breathing_level(hue_offset, settings):
+    cycles = settings.get("breathing_cycles", 4)
+    return 0.5 - 0.5 * math.cos(2 * math.pi * cycles * hue_offset)
+
+def chase_length(settings):
+    return max(1e-6, min(1.0, settings.get("chase_length", 0.15)))
+
+class NumpyEffectEngine:
+    """Vectorized effect kernels over one flat array of perimeter positions for all monitors.
+
+    Every frame is computed as a handful of array operations over all segments of
+    all monitors, then copied into the generator's per-monitor output arrays through
+    NumPy views (no per-segment Python work). The rainbow/gradient kernel indexes the
+    same HuePalette table as the Python path, so both engines produce identical colors.
+    """
+    def __init__(self, frame):
+        self.views = []; index = []; totals = []; start = 0
+        for colors in frame.values():
+            total = len(colors)
+            if total: self.views.append((np.frombuffer(colors, dtype='l'), start, start + total))
+            index.append(np.arange(total, dtype=np.float64)); totals.append(np.full(total, float(max(1, total))))
+            start += total
+        self.size = start
+        self._segment_index = np.concatenate(index) if index else np.zeros(0)
+        self._segment_total = np.concatenate(totals) if totals else np.ones(0)
+        self.positions = self._segment_index / self._segment_total # n / total, perimeter position in [0, 1)
+        self._palette_key = None; self._palette_rgb = None
+        self.packed = np.zeros(self.size, dtype=np.int64)
+
+    def _palette_arrays(self, palette):
+        if self._palette_key != palette.key:
+            self._palette_rgb = np.array(palette.rgb, dtype=np.int64)
+            self._palette_key = palette.key
+        return self._palette_rgb
+
+    @staticmethod
+    def hsv_to_packed(hue, saturation, value):
+        """Vectorized colorsys.hsv_to_rgb producing packed 0xRRGGBB int64 values."""
+        hue = np.asarray(hue) % 1.0
+        value = np.broadcast_to(np.maximum(value, 0.0), hue.shape)
+        h6 = hue * 6.0; i = h6.astype(np.int64); f = h6 - i; i %= 6
+        p = value * (1.0 - saturation); q = value * (1.0 - saturation * f); t = value * (1.0 - saturation * (1.0 - f))
+        r = np.choose(i, (value, q, p, p, t, value)); g = np.choose(i, (t, value, value, q, p, p)); b = np.choose(i, (p, p, t, value, value, q))
+        return ((r * 255).astype(np.int64) << 16) | ((g * 255).astype(np.int64) << 8) | (b * 255).astype(np.int64)
+
+    def compute(self, effect, hue_offset, palette, settings):
+        if not self.size: return
+        if effect == "breathing":
+            level = breathing_level(hue_offset, settings)
+            self.packed[:] = hsv_to_packed(hue_offset, palette.saturation, palette.brightness * level)
+        elif effect == "chase":
+            length = chase_length(settings)
+            distance = (hue_offset - self.positions) % 1.0
+            value = np.where(distance < length, palette.brightness * (1.0 - distance / length), 0.0)
+            self.packed[:] = self.hsv_to_packed(hue_offset + self.positions, palette.saturation, value)
+        else:
+            rgb_table = self._palette_arrays(palette)
+            steps = palette.resolution
+            # (offset + n / total) * steps, the same float operations as the Python loop over hue_fractions
+            indices = ((0.0 if effect == "gradient" else hue_offset) + self.positions) * steps
+            np.take(rgb_table, indices.astype(np.int64) % steps, out=self.packed)
+        for view, start, stop in self.views:
+            view[:] = self.packed[start:stop]
+
+class PerimeterMap:
+    """Flat lookup tables for one monitor in clockwise perimeter order, built once when it is registered.
+
+    Segment n belongs to edges[edge_of[n]] at list position list_index[n]; for the
+    rectangles backend paths[n]/rect_ids[n] name its canvas item. 'changed' is a
+    preallocated scratch array that collect() fills with the perimeter indices whose
+    color differs from last_colors (-1 = never sent), so diffing a frame allocates nothing.
+    """
+    __slots__ = ('total', 'edges', 'edge_of', 'list_index', 'paths', 'rect_ids', 'last_colors', 'changed', 'changed_count')
+
+    def __init__(self, layout, targets=None):
+        total = layout.total_segments
+        self.total = total; self.edges = layout.edges
+        self.edge_of = array('b', [0]) * total; self.list_index = array('l', [0]) * total
+        self.paths = [None] * total; self.rect_ids = array('l', [0]) * total
+        self.last_colors = array('l', [-1]) * total
+        self.changed = array('l', [0]) * total; self.changed_count = 0
+        for e, edge in enumerate(layout.edges):
+            target = targets.get(edge.name) if targets else None
+            for j, n in enumerate(edge.order):
+                self.edge_of[n] = e; self.list_index[n] = j
+                if isinstance(target, tuple): self.paths[n] = target[0]; self.rect_ids[n] = target[1][j]
+
+class FrameSink:
+    """Receives computed frames and emits only the segments whose color changed.
+
+    collect() diffs a frame against each monitor's PerimeterMap in one flat pass and
+    hands the changed segments to emit_segments() (default: one emit_segment() call
+    each); flush() then delivers them. Monitors registered with whole_edges=True get
+    one emit_edge() per changed edge (image backend) instead of per-segment calls.
+    """
+    def __init__(self):
+        self.layouts = {}; self.perimeters = {}; self.whole_edges = {}
+        self._hex = {} # Packed color -> '#rrggbb', bounded (palette colors repeat every frame)
+        # Updates issued vs skipped (color unchanged) in the last frame, plus running totals
+        self.frame_updates = 0; self.frame_skips = 0
+        self.total_updates = 0; self.total_skips = 0
+
+    def add_monitor(self, monitor_index, layout, whole_edges=False, targets=None):
+        self.layouts[monitor_index] = layout
+        self.perimeters[monitor_index] = PerimeterMap(layout, targets)
+        self.whole_edges[monitor_index] = whole_edges
+
+    def remove_monitor(self, monitor_index):
+        self.layouts.pop(monitor_index, None); self.perimeters.pop(monitor_index, None); self.whole_edges.pop(monitor_index, None)
+
+    def invalidate(self):
+        """Forgets what was sent, so the next frame repaints every segment."""
+        for perimeter in self.perimeters.values():
+            perimeter.last_colors[:] = array('l', [-1]) * perimeter.total
+
+    def hex_color(self, color):
+        text = self._hex.get(color)
+        if text is None:
+            if len(self._hex) >= 4096: self._hex.clear() # Effects outside the palette (breathing, chase) produce many colors
+            text = self._hex[color] = f'#{color:06x}'
+        return text
+
+    def collect(self, frame):
+        updates = 0; skips = 0
+        perimeters = self.perimeters
+        for monitor_index, colors in frame.items():
+            perimeter = perimeters.get(monitor_index)
+            if perimeter is None: continue
+            last_colors = perimeter.last_colors; changed = perimeter.changed; count = 0
+            for n in range(perimeter.total):
+                color = colors[n]
+                if last_colors[n] != color: last_colors[n] = color; changed[count] = n; count += 1
+            perimeter.changed_count = count
+            if self.whole_edges.get(monitor_index):
+                touched = 0; edge_of = perimeter.edge_of
+                for k in range(count): touched |= 1 << edge_of[changed[k]]
+                for e, edge in enumerate(perimeter.edges):
+                    if touched >> e & 1: self.emit_edge(monitor_index, edge, [self.hex_color(last_colors[n]) for n in edge.order]); updates += 1
+                    else: skips += 1
+            else:
+                updates += count; skips += perimeter.total - count
+                if count: self.emit_segments(monitor_index, perimeter)
+        self.frame_updates = updates; self.frame_skips = skips
+        self.total_updates += updates; self.total_skips += skips
+
+    def emit_segments(self, monitor_index, perimeter):
+        """Emits perimeter.changed[:changed_count]; their new colors are in perimeter.last_colors."""
+        edges = perimeter.edges; edge_of = perimeter.edge_of; list_index = perimeter.list_index; last_colors = perimeter.last_colors
+        for k in range(perimeter.changed_count):
+            n = perimeter.changed[k]
+            self.emit_segment(monitor_index, edges[edge_of[n]], list_index[n], self.hex_color(last_colors[n]))
+
+    def emit_segment(self, monitor_index, edge, list_index, color): pass
+
+    def emit_edge(self, monitor_index, edge, colors): pass
+
+    def flush(self): pass
+
+    def submit(self, frame):
+        self.collect(frame); self.flush()
+
+class NullSink(FrameSink):
+    """Discards frames without diffing them (measures pure frame computation)."""
+    def collect(self, frame): pass
+
+class RecordingSink(FrameSink):
+    """Keeps the changes of the last 'max_frames' frames as lists of (monitor, edge, list_index, color).
+
+    Whole-edge changes are recorded with list_index None and the list of colors.
+    """
+    def __init__(self, max_frames=100):
+        super().__init__()
+        self.max_frames = max_frames
+        self.frames = []; self._pending = []
+
+    def emit_segment(self, monitor_index, edge, list_index, color):
+        self._pending.append((monitor_index, edge.name, list_index, color))
+
+    def emit_edge(self, monitor_index, edge, colors):
+        self._pending.append((monitor_index, edge.name, None, colors))
+
+    def flush(self):
+        self.frames.append(self._pending); self._pending = []
+        if len(self.frames) > self.max_frames: del self.frames[0]
+
+class TclScriptSink(FrameSink):
+    """Builds the Tcl script a batched frame would run (itemconfigure / image put lines).
+
+    Headless use keeps the script in last_script; TkCanvasSink subclasses this to run it.
+    Targets per monitor map edge name -> (canvas path, rect ids) or EdgeStrip.
+    """
+    def __init__(self):
+        super().__init__()
+        self.targets = {}
+        self.script = []; self.last_script = ""
+
+    def add_monitor(self, monitor_index, layout, whole_edges=False, targets=None):
+        if targets is None: # Headless: invent widget paths / image names with the same shape as Tk's
+            targets = {}
+            for edge in layout.edges:
+                if whole_edges: targets[edge.name] = EdgeStrip(None, edge.orientation == 'vertical', edge.width, edge.height, edge.runs, name=f"strip{monitor_index}{edge.name}")
+                else: targets[edge.name] = (f".!toplevel{monitor_index}{edge.name}.!canvas", list(range(1, edge.count + 1)))
+        super().add_monitor(monitor_index, layout, whole_edges, targets)
+        self.targets[monitor_index] = targets
+
+    def remove_monitor(self, monitor_index):
+        super().remove_monitor(monitor_index); self.targets.pop(monitor_index, None)
+
+    def emit_segments(self, monitor_index, perimeter):
+        paths = perimeter.paths; rect_ids = perimeter.rect_ids; last_colors = perimeter.last_colors; changed = perimeter.changed
+        hex_color = self.hex_color; append = self.script.append
+        for k in range(perimeter.changed_count):
+            n = changed[k]
+            append(f"{paths[n]} itemconfigure {rect_ids[n]} -fill {hex_color(last_colors[n])}")
+
+    def emit_edge(self, monitor_index, edge, colors):
+        self.script.append(self.targets[monitor_index][edge.name].paint_command(colors))
+
+    def flush(self):
+        if not self.script: return
+        script = '\n'.join(self.script); self.script.clear()
+        self.run_script(script)
+
+    def run_script(self, script):
+        self.last_script = script
+
+# --- Network LED Output (DDP) ---
+
+DDP_HEADER = struct.Struct(">BBBBIH") # flags, sequence, data type, destination id, byte offset, byte length
+DDP_VERSION = 0x40; DDP_PUSH = 0x01 # Flags: protocol version 1; PUSH marks the last packet of a frame
+DDP_TYPE_RGB24 = 0x0B; DDP_ID_DISPLAY = 1
+DDP_MAX_PIXELS = 480 # 1440 data bytes + 10 header bytes keeps every packet under a 1500-byte Ethernet MTU
+
+class DdpSink(FrameSink):
+    """Sends each frame to an LED strip as packed RGB over UDP using DDP (Distributed Display Protocol).
+
+    The perimeters of all registered monitors are joined in monitor order and
+    resampled onto led_count LEDs. All packets of a frame live in one preallocated
+    bytearray with their headers already written, and are sent through prebuilt
+    memoryview slices, so collect() and flush() allocate nothing per frame. Frames
+    are only sent when an LED changed, or every keepalive_s to hold the controller
+    in realtime mode. Host names are resolved once, on a helper thread, so a slow
+    lookup (e.g. "wled.local") never blocks the Tk thread; until it completes,
+    flush() sends nothing.
+    """
+    def __init__(self, host, port=4048, led_count=0, led_offset=0, reverse=False, keepalive_s=1.0):
+        super().__init__()
+        self.host = host; self.port = port
+        self.address = None # (ip, port) once resolved
+        try:
+            socket.inet_aton(host); self.address = (host, port) # Already an IPv4 address: nothing to look up
+        except OSError:
+            threading.Thread(target=self._resolve, daemon=True, name="EdgeRgbDdpResolve").start()
+        self.led_count_setting = max(0, int(led_count)); self.led_offset = int(led_offset); self.reverse = bool(reverse)
+        self.keepalive_s = keepalive_s
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False) # Never stall the Tk thread on a full socket buffer
+        self.led_count = 0; self.sequence = 0
+        self.buffer = bytearray(); self.packets = []
+        self.mapping = [] # Per monitor: (monitor_index, perimeter index per LED, buffer byte offset per LED, packed color last written per LED)
+        self.dirty = False; self.last_send = 0.0
+        self.last_send_ms = 0.0; self.send_errors = 0
+
+    @staticmethod
+    def from_settings(settings):
+        """Returns a DdpSink for these settings, or None when the DDP output is off or its socket cannot be created."""
+        host = settings.get("ddp_host", "")
+        if not host: return None
+        try:
+            return DdpSink(host, settings.get("ddp_port", 4048), settings.get("ddp_led_count", 0), settings.get("ddp_led_offset", 0),
+                           settings.get("ddp_reverse", False), settings.get("ddp_keepalive_s", 1.0))
+        except OSError as e:
+            log.error("DdpSink - Could not set up output to %s: %s", host, e)
+            return None
+
+    def _resolve(self):
+        try:
+            self.address = (socket.gethostbyname(self.host), self.port)
+            log.debug("DdpSink - Resolved %s to %s.", self.host, self.address[0])
+        except OSError as e:
+            log.error("DdpSink - Could not resolve LED controller host '%s': %s", self.host, e)
+
+    def add_monitor(self, monitor_index, layout, whole_edges=False, targets=None):
+        super().add_monitor(monitor_index, layout)
+        self._build()
+
+    def remove_monitor(self, monitor_index):
+        super().remove_monitor(monitor_index)
+        self._build()
+
+    def _build(self):
+        """(Re)allocates the packet buffer and the LED -> segment mapping for the current monitors."""
+        order = sorted(self.layouts)
+        total = sum(self.layouts[i].total_segments for i in order)
+        led_count = self.led_count_setting or total
+        self.led_count = led_count
+        packet_count = (led_count + DDP_MAX_PIXELS - 1) // DDP_MAX_PIXELS
+        stride = DDP_HEADER.size + DDP_MAX_PIXELS * 3
+        self.buffer = bytearray(packet_count * stride)
+        view = memoryview(self.buffer); self.packets = []
+        for p in range(packet_count):
+            pixels = min(DDP_MAX_PIXELS, led_count - p * DDP_MAX_PIXELS)
+            flags = DDP_VERSION | (DDP_PUSH if p == packet_count - 1 else 0)
+            DDP_HEADER.pack_into(self.buffer, p * stride, flags, 0, DDP_TYPE_RGB24, DDP_ID_DISPLAY, p * DDP_MAX_PIXELS * 3, pixels * 3)
+            self.packets.append(view[p * stride:p * stride + DDP_HEADER.size + pixels * 3])
+        # Each LED samples the segment at the same fraction of the joined perimeters
+        sources = {i: (array('l'), array('l')) for i in order}
+        starts = {}; start = 0
+        for i in order: starts[i] = start; start += self.layouts[i].total_segments
+        for led in range(led_count if total else 0):
+            position = (led - self.led_offset) % led_count
+            if self.reverse: position = (led_count - position) % led_count
+            segment = position * total // led_count
+            monitor_index = next(i for i in reversed(order) if starts[i] <= segment)
+            p, k = divmod(led, DDP_MAX_PIXELS)
+            sources[monitor_index][0].append(segment - starts[monitor_index]); sources[monitor_index][1].append(p * stride + DDP_HEADER.size + k * 3)
+        self.mapping = [(i, segments, offsets, array('l', [-1]) * len(segments)) for i, (segments, offsets) in sources.items()]
+        self.dirty = True
+
+    def invalidate(self):
+        super().invalidate(); self.dirty = True
+
+    def collect(self, frame):
+        buffer = self.buffer; updates = 0
+        for monitor_index, segments, offsets, last_sent in self.mapping:
+            colors = frame.get(monitor_index)
+            if colors is None: continue
+            for k in range(len(segments)):
+                color = colors[segments[k]]
+                if last_sent[k] != color:
+                    last_sent[k] = color; updates += 1; o = offsets[k]
+                    buffer[o] = color >> 16; buffer[o + 1] = (color >> 8) & 0xFF; buffer[o + 2] = color & 0xFF
+        if updates: self.dirty = True
+        self.frame_updates = updates; self.frame_skips = self.led_count - updates
+        self.total_updates += updates; self.total_skips += self.led_count - updates
+
+    def flush(self, now=None):
+        """Sends the frame if it changed (or the keepalive is due). Returns True if packets went out."""
+        now = time.perf_counter() if now is None else now
+        address = self.address
+        if address is None or not self.packets or not (self.dirty or now - self.last_send >= self.keepalive_s): return False
+        self.sequence = self.sequence % 15 + 1 # 1..15; 0 would mean "sequence not used"
+        buffer = self.buffer; sequence = self.sequence; stride = DDP_HEADER.size + DDP_MAX_PIXELS * 3
+        for p in range(len(self.packets)): buffer[p * stride + 1] = sequence
+        sendto = self.sock.sendto
+        start = time.perf_counter()
+        try:
+            for packet in self.packets: sendto(packet, address)
+        except OSError as e: # Full socket buffer, unreachable host, ...: drop this frame, the next one resends everything
+            self.send_errors += 1
+            limited_log.log(("ddp", address), logging.WARNING, "DdpSink - Send to %s failed (%s so far): %s", address, self.send_errors, e)
+            return False # Still dirty
+        self.last_send_ms = (time.perf_counter() - start) * 1000
+        self.dirty = False; self.last_send = now
+        return True
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+class DdpReceiver:
+    """Minimal DDP listener, a stand-in for an LED controller in tests and benchmarks.
+
+    receive() collects packets until one carries PUSH and returns the frame's pixel
+    bytes (bytes([r, g, b, r, g, b, ...])), or None if nothing complete arrived in time.
+    """
+    def __init__(self, host="127.0.0.1", port=0):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.address = self.sock.getsockname()
+        self.pixels = bytearray(); self.frames = 0; self.packets = 0
+
+    def receive(self, timeout=1.0):
+        self.sock.settimeout(timeout)
+        try:
+            while True:
+                packet = self.sock.recv(65536)
+                flags, _, _, _, offset, length = DDP_HEADER.unpack_from(packet)
+                if len(self.pixels) < offset + length: self.pixels.extend(bytes(offset + length - len(self.pixels)))
+                self.pixels[offset:offset + length] = packet[DDP_HEADER.size:DDP_HEADER.size + length]
+                self.packets += 1
+                if flags & DDP_PUSH:
+                    self.frames += 1
+                    return bytes(self.pixels)
+        except socket.timeout:
+            return None
+
+    def close(self):
+        self.sock.close()
+
+# --- Frame Producer (Threaded Compute) ---
+
+class FrameProducer(threading.Thread):
+    """Worker thread that computes upcoming frames into a small pool of preallocated buffers.
+
+    Each buffer is a dict of array('l') per monitor (same shape as FrameGenerator.frame).
+    The producer renders the frames due at the scheduler's next deadlines, so the Tk
+    callback only has to take() the buffer for its deadline, diff/apply it and
+    release() it. Frames that are no longer current are recycled unused. 'lock' is
+    held while the generator is in use; hold it to change the generator's monitors,
+    then call reset().
+    """
+    def __init__(self, generator, scheduler, buffers=3):
+        super().__init__(daemon=True, name="EdgeRgbFrameProducer")
+        self.generator = generator; self.scheduler = scheduler
+        self.buffer_count = max(2, int(buffers))
+        self.lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._ready = collections.deque() # (target time, buffer), oldest first
+        self._free = []; self._generation = 0; self._next_target = None
+        self.produced = 0; self.discarded = 0
+        self.paused = False # Set while the controller's frame loop is idle: nothing to compute
+        self.reset()
+
+    def reset(self):
+        """Drops queued frames and reallocates buffers for the generator's current monitors."""
+        with self._cond:
+            self._generation += 1
+            self._ready.clear(); self._next_target = None
+            self._free = [{i: array('l', [0]) * len(c) for i, c in self.generator.frame.items()} for _ in range(self.buffer_count)]
+            self._cond.notify_all()
+
+    def pause(self):
+        with self._cond: self.paused = True
+
+    def resume(self):
+        """Restarts computing after pause(); frames queued before the pause are dropped."""
+        with self._cond: self.paused = False
+        self.reset()
+
+    def stop(self):
+        self._stop_event.set()
+        with self._cond: self._cond.notify_all()
+
+    def run(self):
+        log.debug("FrameProducer.run() - Thread started.")
+        try:
+            while not self._stop_event.is_set():
+                with self._cond:
+                    # Ambient frames come from the AmbientSampler; computing them here would grab the screen twice
+                    while (not self._free or self.paused or self.generator.settings.get("effect") == "ambient") and not self._stop_event.is_set(): self._cond.wait(0.1)
+                    if self._stop_event.is_set(): break
+                    buffer = self._free.pop(); generation = self._generation
+                    # Resync with the scheduler after dropped frames so we never render deadlines already past
+                    target = self.scheduler.deadline if self._next_target is None else max(self._next_target, self.scheduler.deadline)
+                    self._next_target = target + self.scheduler.interval
+                with self.lock:
+                    frame = self.generator.compute(self.scheduler.hue_at(target))
+                    for monitor_index, colors in buffer.items():
+                        source = frame.get(monitor_index)
+                        if source is None: continue
+                        if isinstance(source, array) and source.typecode == colors.typecode: colors[:] = source
+                        else: colors[:] = array(colors.typecode, source)
+                with self._cond:
+                    if generation != self._generation: continue # Reset while computing: buffer shape may be stale
+                    self._ready.append((target, buffer)); self.produced += 1
+        except Exception as e:
+            log.exception("FrameProducer.run() - Unexpected error: %s", e)
+        log.debug("FrameProducer.run() - Thread finished.")
+
+    def take(self, now):
+        """Returns (target time, buffer) for the frame due at 'now', or None if it is not ready yet."""
+        with self._cond:
+            best = None
+            horizon = now + self.scheduler.interval / 2 # Tk's after() may fire a little early
+            while self._ready and self._ready[0][0] <= horizon:
+                if best is not None: self._free.append(best[1]); self.discarded += 1
+                best = self._ready.popleft()
+            if best is not None: self._cond.notify_all()
+            return best
+
+    def release(self, buffer):
+        with self._cond:
+            if len(self._free) < self.buffer_count: self._free.append(buffer)
+            self._cond.notify_all()
+
+# --- Ambient Screen Sampling ---
+
+class FrameSource:
+    """Supplies the RGB pixels of a desktop rectangle as a (height, width, 3) NumPy array."""
+    def grab(self, x, y, width, height):
+        raise NotImplementedError
+
+    def grab_regions(self, rects):
+        """Pixels of several (x, y, width, height) rectangles, in order."""
+        return [self.grab(*rect) for rect in rects]
+
+class ScreenSource(FrameSource):
+    """Real screen capture through Pillow's ImageGrab (Windows, macOS, X11).
+
+    ImageGrab captures the whole desktop (or runs screencapture on macOS) for every
+    call and crops afterwards, so grab_regions() captures the bounding box of all
+    rectangles once and returns NumPy views into it.
+    """
+    def grab(self, x, y, width, height):
+        try:
+            image = ImageGrab.grab(bbox=(x, y, x + width, y + height), all_screens=True)
+        except TypeError: # Older Pillow without all_screens
+            image = ImageGrab.grab(bbox=(x, y, x + width, y + height))
+        return np.asarray(image if image.mode == 'RGB' else image.convert('RGB'))
+
+    def grab_regions(self, rects):
+        left = min(r[0] for r in rects); top = min(r[1] for r in rects)
+        pixels = self.grab(left, top, max(r[0] + r[2] for r in rects) - left, max(r[1] + r[3] for r in rects) - top)
+        return [pixels[y - top:y - top + h, x - left:x - left + w] for x, y, w, h in rects]
+
+class SyntheticSource(FrameSource):
+    """Moving color ramps computed from desktop coordinates and time (no display needed)."""
+    def __init__(self, clock=time.perf_counter, speed=120.0):
+        self.clock = clock; self.speed = speed # Pixels per second the pattern scrolls
+
+    def grab(self, x, y, width, height):
+        shift = self.clock() * self.speed
+        ys, xs = np.ogrid[y:y + height, x:x + width]
+        pixels = np.empty((height, width, 3), dtype=np.uint8)
+        pixels[..., 0] = (xs + shift) % 256; pixels[..., 1] = (ys + shift / 2) % 256; pixels[..., 2] = (xs + ys) % 256
+        return pixels
+
+class ImageFileSource(FrameSource):
+    """A still image tiled over the desktop: any file Pillow can read, or a .npy array of shape (h, w, 3)."""
+    def __init__(self, path):
+        if path.lower().endswith('.npy'): pixels = np.load(path)
+        elif Image is not None:
+            with Image.open(path) as image: pixels = np.asarray(image.convert('RGB'))
+        else: raise ImportError("Pillow is needed to read image files (or use a .npy array)")
+        if pixels.ndim == 2: pixels = np.stack([pixels] * 3, axis=-1)
+        self.pixels = np.ascontiguousarray(pixels[..., :3])
+
+    def grab(self, x, y, width, height):
+        h, w = self.pixels.shape[:2]
+        return self.pixels[np.arange(y, y + height)[:, None] % h, np.arange(x, x + width) % w]
+
+def frame_source_from_settings(settings):
+    """Returns the FrameSource selected by "ambient_source", or None (with a warning) if it cannot be used."""
+    name = settings.get("ambient_source", "screen") or "screen"
+    if np is None:
+        log.warning("Ambient mode needs NumPy, which is not installed. Showing the rainbow instead.")
+        return None
+    if name == "synthetic": return SyntheticSource()
+    if name == "screen":
+        if ImageGrab is None:
+            log.warning("Ambient mode screen capture needs Pillow, which is not installed. Showing the rainbow instead.")
+            return None
+        return ScreenSource()
+    try:
+        return ImageFileSource(name)
+    except Exception as e:
+        log.warning("Ambient source '%s' could not be loaded (%s). Showing the rainbow instead.", name, e)
+        return None
+
+class AmbientReducer:
+    """Turns the screen band next to each edge into one average color per segment.
+
+    Only a band of band_px pixels along each edge, starting just inside our own edge
+    windows, is grabbed, and only every downsample-th row and column of it is used.
+    All bands of all monitors are requested from the source together, so screen
+    capture happens once per sample. Per edge, the band is summed across its depth
+    in one NumPy reduction, np.add.reduceat adds those sums up per segment, and the
+    packed colors are scattered into the frame in perimeter order.
+    """
+    def __init__(self, layouts, band_px=64, downsample=4):
+        self.downsample = ds = max(1, int(downsample))
+        self.plans = {} # monitor_index -> [(grab rect, axis summed over, segment starts, samples per segment, perimeter order)]
+        for monitor_index, layout in layouts.items():
+            # Our own edge windows cover 'thickness' pixels along every side: sample just inside them (depth and
+            # length), or the painted border would feed back into its own average
+            inset_h = max(0, min(int(layout.thickness), (layout.height - 1) // 2)); inset_v = max(0, min(int(layout.thickness), (layout.width - 1) // 2))
+            depth_h = max(1, min(int(band_px), layout.height - 2 * inset_h)); depth_v = max(1, min(int(band_px), layout.width - 2 * inset_v))
+            plan = []
+            for edge in layout.edges:
+                if edge.orientation == 'horizontal':
+                    y = layout.y + inset_h if edge.name == 'top' else layout.y + layout.height - inset_h - depth_h
+                    length = layout.width - 2 * inset_v; skip = inset_v
+                    rect = (layout.x + skip, y, length, depth_h); axis = 0; seg_len = edge.seg_w
+                else:
+                    x = layout.x + layout.width - inset_v - depth_v if edge.name == 'right' else layout.x + inset_v
+                    length = layout.height - 2 * inset_h; skip = inset_h
+                    rect = (x, layout.y + skip, depth_v, length); axis = 1; seg_len = edge.seg_h
+                samples = (length + ds - 1) // ds
+                starts = np.minimum([-(-max(0, math.floor(j * seg_len) - skip) // ds) for j in range(edge.count)], samples - 1)
+                counts = np.maximum(np.diff(starts, append=samples), 1) # reduceat yields a single sample for empty ranges
+                plan.append((rect, axis, starts, counts[:, None], np.array(edge.order)))
+            self.plans[monitor_index] = plan
+        self.rects = [step[0] for plan in self.plans.values() for step in plan] # In sample()'s order
+
+    def sample(self, source, frame, brightness=1.0):
+        """Grabs the bands from 'source' and writes packed colors into 'frame' (dict of array('l') per monitor)."""
+        ds = self.downsample
+        bands = iter(source.grab_regions(self.rects) if self.rects else ())
+        for monitor_index, plan in self.plans.items():
+            colors = frame.get(monitor_index)
+            view = np.frombuffer(colors, dtype='l') if colors is not None else None
+            for rect, axis, starts, counts, order in plan:
+                band = next(bands)[::ds, ::ds]
+                if view is None: continue
+                lines = band.sum(axis=axis, dtype=np.uint32) # One row/column sum per sample along the edge
+                rgb = np.add.reduceat(lines, starts, axis=0) * (brightness / band.shape[axis]) / counts
+                rgb = np.clip(rgb, 0, 255).astype(np.int64)
+                view[order] = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+
+class AmbientSampler(threading.Thread):
+    """Worker thread that captures and reduces the screen bands up to ambient_fps times a second.
+
+    Results go into a single latest-wins slot: a capture the Tk loop has not taken
+    yet is replaced by the next one, so the edges always show the newest colors and
+    the worker never waits for Tk. Three buffers (dicts of array('l') per monitor)
+    are enough: one in the slot, one held by the Tk loop between take() and
+    release(), and one being written.
+    """
+    def __init__(self, source, reducer, frame, settings):
+        super().__init__(daemon=True, name="EdgeRgbAmbientSampler")
+        self.source = source; self.reducer = reducer; self.settings = settings
+        self._buffers = [{i: array('l', [0]) * len(c) for i, c in frame.items()} for _ in range(3)]
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._latest = None # (capture time, buffer) not yet taken
+        self._in_use = None
+        self.captures = 0; self.replaced = 0; self.errors = 0; self.last_capture_ms = 0.0
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        log.debug("AmbientSampler.run() - Thread started.")
+        next_capture = time.perf_counter()
+        while not self._stop_event.is_set():
+            with self._lock:
+                latest = self._latest[1] if self._latest else None
+                buffer = next(b for b in self._buffers if b is not latest and b is not self._in_use)
+            captured = time.perf_counter()
+            try:
+                self.reducer.sample(self.source, buffer, self.settings.get("brightness", 1.0))
+            except Exception as e: # Screen locked, display gone, ...: keep trying, but slowly
+                self.errors += 1
+                limited_log.log("ambient", logging.ERROR, "AmbientSampler - Capture failed (%s so far): %s", self.errors, e)
+                self._stop_event.wait(1.0)
+                continue
+            self.last_capture_ms = (time.perf_counter() - captured) * 1000
+            with self._lock:
+                if self._latest is not None: self.replaced += 1
+                self._latest = (captured, buffer)
+            self.captures += 1
+            next_capture = max(next_capture + 1.0 / max(1, self.settings.get("ambient_fps", 30)), time.perf_counter())
+            self._stop_event.wait(next_capture - time.perf_counter())
+        log.debug("AmbientSampler.run() - Thread finished.")
+
+    def take(self):
+        """Returns (capture time, buffer) of the newest capture, or None if nothing new arrived since the last take()."""
+        with self._lock:
+            latest = self._latest
+            if latest is not None: self._latest = None; self._in_use = latest[1]
+            return latest
+
+    def release(self):
+        with self._lock: self._in_use = None
+
+# --- Tk Output ---
+
+class TkCanvasSink(TclScriptSink):
+    """Applies frame changes to the edge canvases of a LightingController.
+
+    Immediate mode issues one itemconfigure / PhotoImage.put per change straight from
+    the PerimeterMaps; batched mode (batch_apply) runs the whole frame as one Tcl
+    script via tk.eval(). Canvases are not polled with winfo_exists() every frame:
+    a monitor whose windows were destroyed behind our back is dropped on its first
+    failing call instead, through on_monitor_lost(monitor_index) so its owner can
+    unregister it everywhere (or just from this sink without a callback).
+    """
+    def __init__(self, tk_root, batch=False, on_monitor_lost=None):
+        super().__init__()
+        self.tk_root = tk_root; self.batch = batch
+        self.on_monitor_lost = on_monitor_lost
+        self.dirty = [] # PerimeterMaps with pending rectangle changes (immediate mode)
+        self.strip_changes = []
+
+    def emit_segments(self, monitor_index, perimeter):
+        if self.batch: return super().emit_segments(monitor_index, perimeter)
+        self.dirty.append((monitor_index, perimeter))
+
+    def emit_edge(self, monitor_index, edge, colors):
+        if self.batch: return super().emit_edge(monitor_index, edge, colors)
+        self.strip_changes.append((monitor_index, self.targets[monitor_index][edge.name], colors))
+
+    def flush(self):
+        dirty = self.dirty; strip_changes = self.strip_changes
+        self.dirty = []; self.strip_changes = []
+        call = self.tk_root.tk.call; hex_color = self.hex_color
+        for monitor_index, perimeter in dirty:
+            paths = perimeter.paths; rect_ids = perimeter.rect_ids; last_colors = perimeter.last_colors; changed = perimeter.changed
+            try:
+                # Rect ids are never deleted while the canvas lives, so no find_withtag() check is needed
+                for k in range(perimeter.changed_count):
+                    n = changed[k]
+                    call(paths[n], 'itemconfigure', rect_ids[n], '-fill', hex_color(last_colors[n]))
+            except tk.TclError as e:
+                self._drop_monitor(monitor_index, e)
+        for monitor_index, strip, colors in strip_changes:
+            if monitor_index not in self.perimeters: continue # Dropped earlier in this flush
+            try:
+                strip.paint(colors)
+            except tk.TclError as e:
+                self._drop_monitor(monitor_index, e)
+        super().flush()
+
+    def _drop_monitor(self, monitor_index, error):
+        if "invalid command name" not in str(error) and "doesn't exist" not in str(error): raise error
+        if monitor_index in self.perimeters:
+            log.warning("TkCanvasSink - Monitor %s windows are gone (%s). Dropping it from the frame loop.", monitor_index, error)
+            if self.on_monitor_lost: self.on_monitor_lost(monitor_index)
+            else: self.remove_monitor(monitor_index)
+
+    def run_script(self, script):
+        while True:
+            try:
+                self.tk_root.tk.eval(script); return
+            except tk.TclError as e:
+                names = self._drop_failed_monitor(e)
+                if not names:
+                    # Not a vanished monitor: forget what we think is on screen so the surviving
+                    # canvases get a full repaint, then let the caller's TclError handling decide.
+                    self.invalidate()
+                    raise
+                # The script stopped at the dropped monitor's first command; rerun the frame without it
+                # (commands that already ran just set the same colors again)
+                script = '\n'.join(line for line in script.split('\n') if line.split(' ', 1)[0] not in names)
+
+    def _drop_failed_monitor(self, error):
+        """Drops the monitor owning the command named in an "invalid command name" error; returns its command names."""
+        match = re.search(r'invalid command name "([^"]+)"', str(error))
+        if not match: return None
+        for monitor_index, targets in list(self.targets.items()):
+            names = {target.name if isinstance(target, EdgeStrip) else target[0] for target in targets.values()}
+            if match.group(1) in names:
+                self._drop_monitor(monitor_index, error)
+                return names
+        return None
+
+# --- Lighting Controller Class ---
+
+MAX_FRAME_ERRORS = 50 # Consecutive failed frames after which the frame loop gives up
 
 class LightingController(threading.Thread):
-    def __init__(self, settings, monitors, selected_indices):
+    def __init__(self, settings, monitors, selected_indices, clock=None):
         super().__init__(daemon=True)
         self.settings = settings # Should contain thickness, speed etc.
         self.monitors = monitors # List of screeninfo.Monitor objects
@@ -42,241 +1586,884 @@ class LightingController(threading.Thread):
         self._stop_event = threading.Event()
         self.tk_root = None
         self.monitor_elements = {} # Store canvases and rects per monitor
-        print("DEBUG: LightingController.__init__")
+        self.generator = FrameGenerator(self.settings) # Headless color computation (layouts + palette)
+        self.sink = None # TkCanvasSink, created together with tk_root; holds the updates/skips counters
+        self.outputs = [] # Extra sinks fed the same frames as the overlay (DdpSink when "ddp_host" is set)
+        self.ambient = None # AmbientSampler while the "ambient" effect is active
+        self._ambient_dirty = True # Monitors or ambient settings changed: restart the sampler on the next frame
+        self.layout_cache = None # LayoutCache when "layout_cache_file" is set
+        self._pending_monitors = [] # (index, monitor) still to be built after the first frame
+        self.first_frame = threading.Event() # Set once the first frame is on screen
+        self.first_frame_time = None # perf_counter() of the first painted frame
+        self._first_frame_queued = False
+        self._frame_errors = 0 # Consecutive frames that raised
+        self.scheduler = None # FrameScheduler, created when the animation loop starts
+        self.stats = None # FrameStats when "stats_interval_s" > 0; None keeps the frame loop free of stats work
+        self.producer = None # FrameProducer when "threaded_compute" is enabled
+        self.clock = clock # SharedClock when running as one of several render processes
+        self._clock_seq = None
+        self.created_time = time.perf_counter()
+        self._idle = False # True while the frame loop is suspended because the output cannot change
+        log.debug("LightingController.__init__")
 
         # Apply defaults for non-monitor settings if missing
         for key, value in DEFAULT_SETTINGS.items():
             self.settings.setdefault(key, value)
 
     def stop(self):
-        print("DEBUG: LightingController.stop() called.")
+        log.debug("LightingController.stop() called.")
         self._stop_event.set()
+        if self.producer: self.producer.stop()
+        if self.ambient: self.ambient.stop()
+        for output in self.outputs: output.close()
         if self.tk_root:
-            print("DEBUG: LightingController.stop() - Scheduling _shutdown_tk.")
+            log.debug("LightingController.stop() - Scheduling _shutdown_tk.")
             self.tk_root.after(0, self._shutdown_tk)
         else:
-             print("DEBUG: LightingController.stop() - No tk_root to schedule shutdown for.")
+             log.debug("LightingController.stop() - No tk_root to schedule shutdown for.")
 
     def _shutdown_tk(self):
-        print("DEBUG: LightingController._shutdown_tk() called.")
+        log.debug("LightingController._shutdown_tk() called.")
         if self.tk_root:
-            print("DEBUG: LightingController._shutdown_tk() - Root exists, attempting quit/destroy.")
+            log.debug("LightingController._shutdown_tk() - Root exists, attempting quit/destroy.")
             try:
                 self.tk_root.quit()
                 self.tk_root.destroy()
-                print("DEBUG: LightingController._shutdown_tk() - Root quit and destroyed.")
+                log.debug("LightingController._shutdown_tk() - Root quit and destroyed.")
             except tk.TclError as e:
-                print(f"DEBUG: LightingController._shutdown_tk() - TclError during quit/destroy (normal if already closing): {e}")
+                log.debug("LightingController._shutdown_tk() - TclError during quit/destroy (normal if already closing): %s", e)
                 pass
             except Exception as e:
-                print(f"ERROR: LightingController._shutdown_tk() - Unexpected error during quit/destroy: {e}")
-                traceback.print_exc()
+                log.exception("LightingController._shutdown_tk() - Unexpected error during quit/destroy: %s", e)
             finally:
                 self.tk_root = None
                 self.monitor_elements = {}
         else:
-             print("DEBUG: LightingController._shutdown_tk() - tk_root was already None.")
+             log.debug("LightingController._shutdown_tk() - tk_root was already None.")
 
     def run(self):
         """Main loop for the lighting thread."""
-        print("DEBUG: LightingController.run() - Thread started.")
+        log.debug("LightingController.run() - Thread started.")
         if not self.selected_indices:
-            print("DEBUG: LightingController.run() - Exiting: No monitors selected during startup.")
+            log.debug("LightingController.run() - Exiting: No monitors selected during startup.")
             return
 
-        print(f"DEBUG: LightingController.run() - Target monitor indices: {self.selected_indices}")
+        log.debug("LightingController.run() - Target monitor indices: %s", self.selected_indices)
 
         try:
-            print("DEBUG: LightingController.run() - Creating Tk root.")
+            log.debug("LightingController.run() - Creating Tk root.")
             self.tk_root = tk.Tk()
             self.tk_root.withdraw()
+            self.sink = TkCanvasSink(self.tk_root, batch=self.settings.get("batch_apply", False), on_monitor_lost=self._destroy_monitor_lights)
+            self._create_outputs()
+            cache_path = self.settings.get("layout_cache_file", "")
+            self.layout_cache = LayoutCache(cache_path) if cache_path else None
 
-            # Create windows ONLY for selected monitors
-            for i in self.selected_indices:
-                if 0 <= i < len(self.monitors):
-                    monitor = self.monitors[i]
-                    print(f"DEBUG: LightingController.run() - Initializing lights for Monitor {i} ({monitor.width}x{monitor.height} at {monitor.x},{monitor.y})")
-                    self._create_monitor_lights(monitor, i)
-                else:
-                    print(f"WARNING: LightingController.run() - Invalid monitor index {i} encountered (should have been caught earlier). Skipping.")
-
+            # Create windows ONLY for selected monitors. Only the first one is built before the
+            # animation starts; the rest follow one per idle pass once the first frame is painted.
+            pending = list(self.selected_indices)
+            while pending and not self.monitor_elements: self._create_selected_monitor(pending.pop(0))
+            self._pending_monitors = [(i, self.monitors[i]) for i in pending if 0 <= i < len(self.monitors)]
 
             if not self.monitor_elements:
-                print("ERROR: LightingController.run() - No valid monitor elements created. Exiting thread.")
+                log.error("LightingController.run() - No valid monitor elements created. Exiting thread.")
                 if self.tk_root: self.tk_root.destroy()
                 self.tk_root = None
                 return
 
-            print("DEBUG: LightingController.run() - Starting animation loop (scheduling update_colors).")
+            log.debug("LightingController.run() - Starting animation loop (scheduling update_colors).")
             self.hue_offset = 0.0
+            self.scheduler = FrameScheduler.from_settings(self.settings)
+            self.scheduler.start()
+            if self.clock: self._sync_clock()
+            self.stats = FrameStats.from_settings(self.settings)
+            if self.settings.get("threaded_compute", False):
+                log.debug("LightingController.run() - Starting frame producer thread.")
+                self.producer = FrameProducer(self.generator, self.scheduler, self.settings.get("compute_buffers", 3))
+                self.producer.start()
             self.tk_root.after(0, self.update_colors)
-            print("DEBUG: LightingController.run() - Starting Tkinter mainloop.")
+            log.debug("LightingController.run() - Starting Tkinter mainloop.")
             self.tk_root.mainloop()
-            print("DEBUG: LightingController.run() - Tkinter mainloop finished.")
+            log.debug("LightingController.run() - Tkinter mainloop finished.")
 
         except Exception as e:
-            print(f"ERROR: LightingController.run() - Unhandled exception in thread: {e}")
-            traceback.print_exc()
+            log.exception("LightingController.run() - Unhandled exception in thread: %s", e)
         finally:
-            print("DEBUG: LightingController.run() - Finally block reached, ensuring cleanup.")
+            log.debug("LightingController.run() - Finally block reached, ensuring cleanup.")
+            if self.producer:
+                self.producer.stop(); self.producer.join(timeout=1.0)
             if self.tk_root: self._shutdown_tk()
-            print("DEBUG: LightingController.run() - Thread finished.")
+            log.debug("LightingController.run() - Thread finished.")
+
+    def _create_selected_monitor(self, i):
+        if 0 <= i < len(self.monitors):
+            monitor = self.monitors[i]
+            log.debug("LightingController.run() - Initializing lights for Monitor %s (%sx%s at %s,%s)", i, monitor.width, monitor.height, monitor.x, monitor.y)
+            self._create_monitor_lights(monitor, i)
+        else:
+            log.warning("LightingController.run() - Invalid monitor index %s encountered (should have been caught earlier). Skipping.", i)
+
+    def _create_pending_monitors(self):
+        """Builds the next monitor deferred at startup; one per idle pass, so frames keep flowing in between."""
+        if self._stop_event.is_set() or not self.tk_root: return
+        while self._pending_monitors:
+            i, monitor = self._pending_monitors.pop(0)
+            # A monitor update may have built, moved or removed it in the meantime
+            if i < len(self.monitors) and self.monitors[i] is monitor and i in self.selected_indices and i not in self.monitor_elements:
+                self._create_selected_monitor(i); self._wake()
+                break
+        if self._pending_monitors: self.tk_root.after_idle(self._create_pending_monitors)
+        elif self.layout_cache is not None: self.layout_cache.save()
+
+    def _mark_first_frame(self):
+        """Runs on the idle pass after the first frame, i.e. once Tk has actually redrawn it."""
+        self.first_frame_time = time.perf_counter()
+        log.debug("LightingController - First frame painted %.1f ms after the controller was created.", (self.first_frame_time - self.created_time) * 1000)
+        self.first_frame.set()
+        if self._pending_monitors: self.tk_root.after_idle(self._create_pending_monitors)
+        elif self.layout_cache is not None: self.layout_cache.save()
+
+    def _layout_for(self, monitor):
+        thickness = self.settings.get("thickness", 5); seg_len = self.settings.get("segment_len", 30)
+        if self.layout_cache is not None: return self.layout_cache.get(monitor, thickness, seg_len)
+        return MonitorLayout(monitor, thickness, seg_len)
 
     def _create_monitor_lights(self, monitor, monitor_index):
         """Creates the four edge windows for a specific monitor."""
-        print(f"DEBUG: LightingController._create_monitor_lights({monitor_index})")
-        thickness = self.settings.get("thickness", 5)
-        seg_len = self.settings.get("segment_len", 30)
+        log.debug("LightingController._create_monitor_lights(%s)", monitor_index)
+        layout = self._layout_for(monitor)
 
-        m_width = monitor.width; m_height = monitor.height
-        m_x = monitor.x; m_y = monitor.y
+        log.debug("Monitor %s - Segments H: %s, V: %s, Total: %s", monitor_index, layout.segments_h, layout.segments_v, layout.total_segments)
+        log.debug("Monitor %s - Seg W: %.2f, H: %.2f", monitor_index, layout.seg_width, layout.seg_height)
 
-        segments_h = max(1, m_width // seg_len)
-        segments_v = max(1, m_height // seg_len)
-        total_segments = 2 * segments_h + 2 * segments_v
-
-        seg_width = m_width / segments_h if segments_h > 0 else m_width
-        seg_height = m_height / segments_v if segments_v > 0 else m_height
-
-        print(f"DEBUG: Monitor {monitor_index} - Segments H: {segments_h}, V: {segments_v}, Total: {total_segments}")
-        print(f"DEBUG: Monitor {monitor_index} - Seg W: {seg_width:.2f}, H: {seg_height:.2f}")
-
-        canvases = {}; rect_ids = {'top': [], 'bottom': [], 'left': [], 'right': []}
+        use_strips = self.settings.get("render_backend", "rectangles") == "image"
+        canvases = {}; rect_ids = {}; strips = {}
 
         try:
-            canvases['top'], rect_ids['top'] = self._create_edge_window(f"{m_width}x{thickness}+{m_x}+{m_y}",'horizontal', segments_h, seg_width, thickness, monitor_index, 'top')
-            canvases['bottom'], rect_ids['bottom'] = self._create_edge_window(f"{m_width}x{thickness}+{m_x}+{m_y + m_height - thickness}",'horizontal', segments_h, seg_width, thickness, monitor_index, 'bottom')
-            canvases['left'], rect_ids['left'] = self._create_edge_window(f"{thickness}x{m_height}+{m_x}+{m_y}",'vertical', segments_v, thickness, seg_height, monitor_index, 'left')
-            canvases['right'], rect_ids['right'] = self._create_edge_window(f"{thickness}x{m_height}+{m_x + m_width - thickness}+{m_y}",'vertical', segments_v, thickness, seg_height, monitor_index, 'right')
+            for edge in layout.edges:
+                canvases[edge.name], items = self._create_edge_window(edge, monitor_index, use_strips)
+                if use_strips: strips[edge.name] = items; rect_ids[edge.name] = []
+                else: rect_ids[edge.name] = items
 
-            self.monitor_elements[monitor_index] = {'canvases': canvases, 'rect_ids': rect_ids, 'segments_h': segments_h, 'segments_v': segments_v, 'total_segments': total_segments}
-            print(f"DEBUG: LightingController._create_monitor_lights({monitor_index}) - Successfully created windows.")
+            self._register_monitor(monitor_index, layout, canvases, rect_ids, strips)
+            log.debug("LightingController._create_monitor_lights(%s) - Successfully created windows.", monitor_index)
         except Exception as e:
-             print(f"ERROR: LightingController._create_monitor_lights({monitor_index}) - Failed to create windows: {e}")
-             traceback.print_exc()
+             log.exception("LightingController._create_monitor_lights(%s) - Failed to create windows: %s", monitor_index, e)
+
+    def _register_monitor(self, monitor_index, layout, canvases, rect_ids, strips):
+        """Stores a monitor's windows and (re)registers its layout with the generator and the sink."""
+        use_strips = bool(strips)
+        targets = strips if use_strips else {name: (str(canvases[name]), ids) for name, ids in rect_ids.items()}
+        producer = self.producer
+        if producer: producer.lock.acquire() # The worker must not compute while the generator's monitors change
+        try:
+            self.generator.add_monitor(monitor_index, layout)
+            if producer: producer.reset()
+        finally:
+            if producer: producer.lock.release()
+        self.sink.add_monitor(monitor_index, layout, use_strips, targets)
+        for output in self.outputs: output.add_monitor(monitor_index, layout)
+        self._ambient_dirty = True
+        self.monitor_elements[monitor_index] = {'canvases': canvases, 'rect_ids': rect_ids, 'strips': strips, 'layout': layout, 'segments_h': layout.segments_h, 'segments_v': layout.segments_v, 'total_segments': layout.total_segments}
+
+    def _unregister_monitor(self, monitor_index):
+        """Removes a monitor from the generator/sink and returns its elements (windows are left alone)."""
+        producer = self.producer
+        if producer: producer.lock.acquire()
+        try:
+            self.generator.remove_monitor(monitor_index)
+            if producer: producer.reset()
+        finally:
+            if producer: producer.lock.release()
+        self.sink.remove_monitor(monitor_index)
+        for output in self.outputs: output.remove_monitor(monitor_index)
+        self._ambient_dirty = True
+        return self.monitor_elements.pop(monitor_index, None)
+
+    def _destroy_monitor_lights(self, monitor_index):
+        elements = self._unregister_monitor(monitor_index)
+        if not elements: return
+        for canvas in elements['canvases'].values():
+            try:
+                if canvas is not None: canvas.master.destroy()
+            except tk.TclError:
+                pass # Already gone
+        log.debug("LightingController._destroy_monitor_lights(%s) - Windows destroyed.", monitor_index)
 
-    def _create_edge_window(self, geometry, orientation, num_segments, seg_w, seg_h, monitor_index, edge_name):
-        """Helper function to create a single borderless edge window."""
-        print(f"DEBUG: _create_edge_window({monitor_index}, {edge_name}) - Geo: {geometry}")
+    def update_monitors(self, monitors, selected_indices):
+        """Adopts a new monitor list (thread-safe; applied on the Tk thread)."""
+        if self.tk_root:
+            try:
+                self.tk_root.after(0, self._reconcile_monitors, list(monitors), list(selected_indices))
+            except (RuntimeError, tk.TclError) as e:
+                log.debug("LightingController.update_monitors() - Could not schedule on Tk thread: %s", e)
+
+    def _reconcile_monitors(self, monitors, selected_indices):
+        """Creates, moves or destroys only the monitors that changed; the rest keep animating untouched."""
+        old = {monitor_identity(self.monitors[i]): i for i in self.monitor_elements if 0 <= i < len(self.monitors)}
+        new = {monitor_identity(monitors[i]): i for i in selected_indices if 0 <= i < len(monitors)}
+        removed = [i for identity, i in old.items() if identity not in new]
+        added = [i for identity, i in new.items() if identity not in old]
+        # Kept monitors whose index or geometry changed; everything else is left alone
+        changed = [(old[identity], i) for identity, i in new.items() if identity in old
+                   and (old[identity] != i or monitor_key(self.monitors[old[identity]]) != monitor_key(monitors[i]))]
+        log.debug("LightingController._reconcile_monitors() - Removed %s, added %s, changed %s", removed, added, changed)
+
+        for i in removed: self._destroy_monitor_lights(i)
+        detached = [(new_i, self._unregister_monitor(old_i)) for old_i, new_i in changed] # Indices may swap, so detach all first
+        self.monitors = monitors; self.selected_indices = sorted(new.values())
+        for new_i, elements in detached:
+            if not elements: continue
+            self._register_monitor(new_i, elements['layout'], elements['canvases'], elements['rect_ids'], elements['strips'])
+            self._relayout_monitor(new_i) # Moves/resizes only the edges whose geometry changed
+        for i in added:
+            log.debug("LightingController._reconcile_monitors() - Initializing lights for Monitor %s (%sx%s at %s,%s)", i, monitors[i].width, monitors[i].height, monitors[i].x, monitors[i].y)
+            self._create_monitor_lights(monitors[i], i)
+        if self.layout_cache is not None: self.layout_cache.save()
+        self._wake()
+
+    def record_monitor_poll(self, poll_ms, interval_s):
+        stats = self.stats
+        if stats is not None: stats.record_poll(poll_ms, interval_s)
+
+    def _create_edge_window(self, edge, monitor_index, use_strips=False):
+        """Helper function to create a single borderless edge window from its EdgeLayout."""
+        edge_name = edge.name
+        log.debug("_create_edge_window(%s, %s) - Geo: %s", monitor_index, edge_name, edge.geometry)
         if not self.tk_root:
-            print(f"ERROR: _create_edge_window({monitor_index}, {edge_name}) - tk_root is None!")
+            log.error("_create_edge_window(%s, %s) - tk_root is None!", monitor_index, edge_name)
             return None, []
         try:
             win = tk.Toplevel(self.tk_root)
-            win.overrideredirect(True); win.geometry(geometry)
+            win.overrideredirect(True); win.geometry(edge.geometry)
             win.attributes("-topmost", True); win.attributes("-disabled", True); win.attributes("-toolwindow", True)
             canvas = tk.Canvas(win, highlightthickness=0, bg='black')
             canvas.pack(fill=tk.BOTH, expand=tk.YES)
-            rect_ids = []
-            for i in range(num_segments):
-                if orientation == 'horizontal': x1, y1, x2, y2 = i * seg_w, 0, (i + 1) * seg_w, seg_h
-                else: x1, y1, x2, y2 = 0, i * seg_h, seg_w, (i + 1) * seg_h
-                x1, y1, x2, y2 = map(math.floor, [x1, y1, x2, y2])
-                x2 = max(x1 + 1, x2); y2 = max(y1 + 1, y2)
-                rect_id = canvas.create_rectangle(x1, y1, x2, y2, fill='black', outline='')
-                rect_ids.append(rect_id)
-            print(f"DEBUG: _create_edge_window({monitor_index}, {edge_name}) - Created {len(rect_ids)} segments.")
-            return canvas, rect_ids
+            return canvas, self._populate_edge_canvas(canvas, edge, monitor_index, use_strips)
         except Exception as e_create:
-             print(f"ERROR: _create_edge_window({monitor_index}, {edge_name}) - Exception: {e_create}")
-             traceback.print_exc()
+             log.exception("_create_edge_window(%s, %s) - Exception: %s", monitor_index, edge_name, e_create)
              return None, []
 
-    def _get_color(self, segment_index, total_segments, current_hue_offset):
-        hue_fraction = segment_index / max(1, total_segments)
-        hue = (current_hue_offset + hue_fraction) % 1.0
-        sat = max(0.0, min(1.0, self.settings.get("saturation", 1.0)))
-        bri = max(0.0, min(1.0, self.settings.get("brightness", 1.0)))
-        r, g, b = colorsys.hsv_to_rgb(hue, sat, bri)
-        return f'#{int(r*255):02x}{int(g*255):02x}{int(b*255):02x}'
+    def _populate_edge_canvas(self, canvas, edge, monitor_index, use_strips):
+        """Draws an edge's segments on its canvas: rect ids (rectangles backend) or an EdgeStrip (image backend)."""
+        if use_strips:
+            strip = self._create_edge_strip(canvas, edge)
+            log.debug("_create_edge_window(%s, %s) - Created image strip (%sx%s, %s segments).", monitor_index, edge.name, strip.width, strip.height, edge.count)
+            return strip
+        rect_ids = [canvas.create_rectangle(*rect, fill='black', outline='') for rect in edge.rects]
+        log.debug("_create_edge_window(%s, %s) - Created %s segments.", monitor_index, edge.name, len(rect_ids))
+        return rect_ids
+
+    def _relayout_monitor(self, monitor_index):
+        """Applies thickness/segment_len/render_backend to an existing monitor, reusing its windows.
+
+        Only edges whose geometry or segments actually changed are touched: their
+        window is moved/resized if needed and their canvas items are redrawn.
+        """
+        elements = self.monitor_elements.get(monitor_index)
+        if elements is None or not (0 <= monitor_index < len(self.monitors)): return
+        old_layout = elements['layout']
+        layout = self._layout_for(self.monitors[monitor_index])
+        use_strips = self.settings.get("render_backend", "rectangles") == "image"
+        backend_changed = use_strips != bool(elements['strips'])
+        canvases = dict(elements['canvases']); rect_ids = dict(elements['rect_ids']); strips = dict(elements['strips'])
+        rebuilt = []
+        for old_edge, edge in zip(old_layout.edges, layout.edges):
+            if not backend_changed and old_edge.geometry == edge.geometry and old_edge.rects == edge.rects: continue
+            canvas = canvases.get(edge.name)
+            if canvas is None or not canvas.winfo_exists():
+                canvas, items = self._create_edge_window(edge, monitor_index, use_strips)
+                canvases[edge.name] = canvas
+            else:
+                if old_edge.geometry != edge.geometry: canvas.master.geometry(edge.geometry)
+                canvas.delete('all')
+                items = self._populate_edge_canvas(canvas, edge, monitor_index, use_strips)
+            strips.pop(edge.name, None)
+            if use_strips: strips[edge.name] = items; rect_ids[edge.name] = []
+            else: rect_ids[edge.name] = items
+            rebuilt.append(edge.name)
+        self._register_monitor(monitor_index, layout, canvases, rect_ids, strips)
+        log.debug("LightingController._relayout_monitor(%s) - Rebuilt edges: %s", monitor_index, rebuilt or 'none')
+
+    def apply_settings(self, changes):
+        """Pushes changed settings into the running controller (thread-safe; applied on the Tk thread)."""
+        if self.tk_root:
+            try:
+                self.tk_root.after(0, self._apply_settings, dict(changes))
+                return
+            except (RuntimeError, tk.TclError) as e:
+                log.debug("LightingController.apply_settings() - Could not schedule on Tk thread: %s", e)
+        self.settings.update(changes)
+
+    def _apply_settings(self, changes):
+        log.debug("LightingController._apply_settings() - %s", changes)
+        self.settings.update(changes)
+        if self.scheduler: self.scheduler.configure(*FrameScheduler.timing_from_settings(self.settings))
+        if self.producer: self.producer.reset() # Frames computed ahead used the old settings
+        if any(key.startswith("stats_") for key in changes): self.stats = FrameStats.from_settings(self.settings)
+        if "batch_apply" in changes and self.sink: self.sink.batch = bool(changes["batch_apply"])
+        if any(key.startswith("ddp_") for key in changes): self._create_outputs()
+        if "effect" in changes or any(key.startswith("ambient_") for key in changes): self._ambient_dirty = True
+        if GEOMETRY_SETTINGS & set(changes):
+            for monitor_index in list(self.monitor_elements):
+                try:
+                    self._relayout_monitor(monitor_index)
+                except Exception as e:
+                    log.exception("LightingController._relayout_monitor(%s) - %s", monitor_index, e)
+            if self.layout_cache is not None: self.layout_cache.save()
+        self._wake()
+
+    def _create_edge_strip(self, canvas, edge):
+        """Creates the edge-sized PhotoImage used by the "image" backend."""
+        image = tk.PhotoImage(master=canvas, width=edge.width, height=edge.height)
+        canvas.create_image(0, 0, image=image, anchor=tk.NW)
+        return EdgeStrip(image, edge.orientation == 'vertical', edge.width, edge.height, edge.runs)
+
+    def _sync_clock(self):
+        """Adopts the shared clock's epoch/phase/rate and colors if they changed since the last frame."""
+        if self.clock.sequence() == self._clock_seq: return
+        seq, epoch, phase, hue_rate, interval, saturation, brightness = self.clock.read()
+        scheduler = self.scheduler
+        scheduler.epoch = epoch; scheduler.phase = phase; scheduler.hue_rate = hue_rate; scheduler.interval = scheduler.base_interval = interval
+        self.settings["saturation"] = saturation; self.settings["brightness"] = brightness
+        self._clock_seq = seq
+        if self.producer: self.producer.reset() # Frames computed ahead used the old clock
+
+    def _create_outputs(self):
+        """(Re)creates the network LED output for the current settings and registers the current monitors with it."""
+        for output in self.outputs: output.close()
+        self.outputs = []
+        ddp = DdpSink.from_settings(self.settings)
+        if ddp is None: return
+        for monitor_index, elements in sorted(self.monitor_elements.items()): ddp.add_monitor(monitor_index, elements['layout'])
+        log.debug("LightingController - DDP output to %s:%s, %s LEDs in %s packets.", ddp.host, ddp.port, ddp.led_count, len(ddp.packets))
+        self.outputs.append(ddp)
+
+    def _flush_outputs(self, now):
+        for output in self.outputs:
+            if output.flush(now) and self.stats is not None: self.stats.record_send(output.last_send_ms)
+
+    def _output_keepalive(self):
+        """While the frame loop is idle, resends the static frame so LED controllers stay in realtime mode."""
+        if not self._idle or self._stop_event.is_set() or not self.outputs or not self.tk_root: return
+        self._flush_outputs(time.perf_counter())
+        self.tk_root.after(max(50, int(self.settings.get("ddp_keepalive_s", 1.0) * 1000)), self._output_keepalive)
+
+    def _update_ambient(self):
+        """Starts, restarts or stops the AmbientSampler to match the effect, ambient settings and monitors."""
+        self._ambient_dirty = False
+        if self.ambient: self.ambient.stop(); self.ambient = None
+        if self.settings.get("effect") != "ambient": return
+        producer = self.producer
+        if producer:
+            with producer.lock: ambient = self.generator.get_ambient()
+        else: ambient = self.generator.get_ambient()
+        if ambient is None: return # Warned already; the generator shows the rainbow
+        self.ambient = AmbientSampler(ambient[0], ambient[1], self.generator.frame, self.settings)
+        self.ambient.start()
+
+    def _is_static(self):
+        """True if every future frame would look like the current one."""
+        if not self.settings.get("idle_when_static", True): return False
+        effect = self.settings.get("effect", "rainbow")
+        if effect == "ambient": return False
+        return effect == "gradient" or self.settings.get("brightness", 1.0) <= 0 or self.scheduler.hue_rate == 0
+
+    def _adaptive_interval(self, frame_updates):
+        """Frame interval at which the fastest-changing segment moves by about 'adaptive_threshold' channel levels.
+
+        Hue rotation changes a channel by up to 6 * 255 * saturation * brightness per hue
+        cycle; breathing and chase add their own brightness ramps. When a frame changed
+        nothing at all, the interval backs off further; any change resets it.
+        """
+        scheduler = self.scheduler; settings = self.settings
+        base = scheduler.base_interval
+        longest = max(base, 1.0 / max(0.1, settings.get("min_fps", 5)))
+        rate = abs(scheduler.hue_rate)
+        brightness = max(0.0, min(1.0, settings.get("brightness", 1.0))); saturation = max(0.0, min(1.0, settings.get("saturation", 1.0)))
+        levels_per_s = 6 * 255 * saturation * brightness * rate
+        effect = settings.get("effect", "rainbow")
+        if effect == "ambient": levels_per_s = math.inf # Screen content can change at any time; only the no-change backoff applies
+        elif effect == "breathing": levels_per_s = max(levels_per_s, 255 * brightness * math.pi * settings.get("breathing_cycles", 4) * rate)
+        elif effect == "chase": levels_per_s = max(levels_per_s, 255 * brightness * rate / chase_length(settings))
+        wanted = settings.get("adaptive_threshold", 1.0) / levels_per_s if levels_per_s > 0 else longest
+        interval = min(max(base, wanted), longest)
+        if frame_updates == 0: interval = min(longest, max(interval, scheduler.interval * 1.5)) # Nothing visible changed
+        return interval
+
+    def _wake(self):
+        """Resumes a suspended frame loop (after a settings or monitor change)."""
+        if not self._idle or self._stop_event.is_set() or not self.tk_root: return
+        log.debug("LightingController._wake() - Resuming frame loop.")
+        self._idle = False
+        self.scheduler.resume()
+        if self.producer: self.producer.resume()
+        self.tk_root.after(0, self.update_colors)
+
+    def _idle_check(self):
+        """Render processes get settings through the shared clock only, so an idle one keeps an eye on it."""
+        if not self._idle or self._stop_event.is_set(): return
+        if self.clock.sequence() != self._clock_seq: self._wake()
+        else: self.tk_root.after(250, self._idle_check)
+
+    def _collect(self, frame):
+        self.sink.collect(frame)
+        for output in self.outputs: output.collect(frame)
 
     def update_colors(self):
         if self._stop_event.is_set(): return
         if not self.tk_root or not hasattr(self.tk_root, 'winfo_exists') or not self.tk_root.winfo_exists(): return
 
         try:
+            if self.clock: self._sync_clock()
+            if self._ambient_dirty: self._update_ambient()
             start_time = time.perf_counter()
-            hue_speed = self.settings.get("hue_speed", 0.005)
-            self.hue_offset = (self.hue_offset + hue_speed) % 1.0
-
-            for monitor_index, elements in list(self.monitor_elements.items()):
-                # No need to check selected_indices here, only created elements for selected ones
-                canvases = elements.get('canvases'); rect_ids = elements.get('rect_ids')
-                segments_h = elements.get('segments_h'); segments_v = elements.get('segments_v')
-                total_segments = elements.get('total_segments')
-
-                if not canvases or not rect_ids or segments_h is None or segments_v is None or total_segments is None: continue
-                if not all(c and hasattr(c, 'winfo_exists') and c.winfo_exists() for c in canvases.values()): continue
-
-                current_segment = 0
-                def update_edge(edge, count, reverse_index=False):
-                    nonlocal current_segment
-                    rect_list = rect_ids.get(edge, []); canvas = canvases.get(edge)
-                    if not canvas or not rect_list: return
-                    for i in range(count):
-                        list_index = (count - 1 - i) if reverse_index else i
-                        if 0 <= list_index < len(rect_list):
-                            color = self._get_color(current_segment, total_segments, self.hue_offset)
-                            if canvas.find_withtag(rect_list[list_index]): canvas.itemconfig(rect_list[list_index], fill=color)
-                        current_segment += 1
-                update_edge('top', segments_h); update_edge('right', segments_v)
-                update_edge('bottom', segments_h, reverse_index=True); update_edge('left', segments_v, reverse_index=True)
-
-            update_ms = self.settings.get("update_ms", 15)
-            elapsed_ms = (time.perf_counter() - start_time) * 1000
-            delay = max(1, update_ms - int(elapsed_ms))
-
+            # Compute (headless generator + diff), then apply the collected changes to Tk
+            producer = self.producer; ambient = self.ambient; captured = None
+            ready = producer.take(start_time) if producer and not ambient else None
+            if ambient is not None:
+                latest = ambient.take()
+                if latest is not None:
+                    captured, buffer = latest
+                    self._collect(buffer); ambient.release()
+                else: self._collect({}) # No new capture since the last frame: nothing changed
+            elif ready is not None:
+                target, buffer = ready
+                self.hue_offset = self.scheduler.hue_at(target)
+                self._collect(buffer) # Sinks copy what they need, so the buffer can go straight back
+                producer.release(buffer)
+            else:
+                self.hue_offset = self.scheduler.hue_at(start_time)
+                if producer:
+                    with producer.lock: self._collect(self.generator.compute(self.hue_offset)) # Worker fell behind
+                else:
+                    self._collect(self.generator.compute(self.hue_offset))
+            apply_start = time.perf_counter()
+            self.sink.flush()
+            if self.outputs: self._flush_outputs(apply_start)
+
+            end_time = time.perf_counter()
+            late_ms = self.scheduler.lateness(start_time) * 1000
+            if self.settings.get("adaptive_fps", False): self.scheduler.interval = self._adaptive_interval(self.sink.frame_updates)
+            elif self.scheduler.interval != self.scheduler.base_interval: self.scheduler.interval = self.scheduler.base_interval
+            delay, dropped = self.scheduler.advance(end_time)
+            stats = self.stats
+            if stats is not None:
+                stats.record((apply_start - start_time) * 1000, (end_time - apply_start) * 1000, late_ms, dropped)
+                stats.record_changes(self.sink.frame_updates, self.sink.frame_skips)
+                if captured is not None: stats.record_capture((end_time - captured) * 1000)
+                stats.maybe_report(end_time)
+            if not self._first_frame_queued:
+                self._first_frame_queued = True; self.tk_root.after_idle(self._mark_first_frame)
+
+            if self._is_static(): # Settings changes reset the producer, so even a frame computed ahead is current
+                log.debug("update_colors - Output is static, suspending frame loop until settings change.")
+                self._idle = True
+                if producer: producer.pause()
+                if self.clock: self.tk_root.after(250, self._idle_check)
+                if self.outputs: self.tk_root.after(0, self._output_keepalive)
+                return
+            self._frame_errors = 0
             if not self._stop_event.is_set() and self.tk_root and self.tk_root.winfo_exists():
                 self.tk_root.after(delay, self.update_colors)
-            # else: print("DEBUG: update_colors - Not scheduling next update.") # Too noisy
         except tk.TclError as e:
-            if "invalid command name" in str(e): pass # print(f"WARNING: update_colors - TclError (widget destroyed): {e}")
-            else: print(f"ERROR: update_colors - TclError: {e}"); traceback.print_exc(); self.stop()
+            if not self._stop_event.is_set(): self._frame_failed(e) # Otherwise widgets are being destroyed during shutdown
         except Exception as e:
-            print(f"ERROR: update_colors - Unexpected error: {e}"); traceback.print_exc(); self.stop()
+            self._frame_failed(e)
+
+    def _frame_failed(self, error):
+        """Logs a frame that raised (rate-limited) and keeps animating; stops after MAX_FRAME_ERRORS in a row."""
+        self._frame_errors += 1
+        if self._frame_errors >= MAX_FRAME_ERRORS:
+            log.error("update_colors - %s frames in a row failed, stopping: %s", self._frame_errors, error, exc_info=True)
+            self.stop(); return
+        limited_log.log(("frame", id(self)), logging.ERROR, "update_colors - Frame failed (%s in a row): %s", self._frame_errors, error, exc_info=True)
+        try:
+            if self.sink: self.sink.invalidate() # The failed frame may be half applied: repaint everything next time
+            if not self._stop_event.is_set() and self.tk_root and self.tk_root.winfo_exists():
+                self.tk_root.after(max(1, int(self.scheduler.interval * 1000)) if self.scheduler else 100, self.update_colors)
+        except tk.TclError: pass # Tk itself is gone; run() is shutting down
+
+# --- Multi-Process Rendering (Shared Clock + Supervisor) ---
+
+class SharedClock:
+    """Animation clock and color settings in a shared-memory block, read by every render process.
+
+    Layout: sequence counter followed by epoch, phase, hue rate, frame interval,
+    saturation and brightness. Writers use a seqlock (odd sequence = write in
+    progress), so readers never see a half-updated block and can detect changes
+    by comparing one integer. Times are time.perf_counter() values, which share
+    a system-wide origin across processes on Windows (QPC) and Linux (CLOCK_MONOTONIC).
+    """
+    LAYOUT = struct.Struct('<Q6d')
+
+    def __init__(self, shm, owner):
+        self.shm = shm; self.owner = owner
+        self.name = shm.name
+
+    @staticmethod
+    def create():
+        return SharedClock(shared_memory.SharedMemory(create=True, size=SharedClock.LAYOUT.size), owner=True)
+
+    @staticmethod
+    def attach(name):
+        return SharedClock(shared_memory.SharedMemory(name=name), owner=False)
+
+    def sequence(self):
+        return struct.unpack_from('<Q', self.shm.buf, 0)[0]
+
+    def publish(self, epoch, phase, hue_rate, interval, saturation, brightness):
+        buf = self.shm.buf
+        seq = self.sequence()
+        struct.pack_into('<Q', buf, 0, seq + 1) # Odd: write in progress
+        SharedClock.LAYOUT.pack_into(buf, 0, seq + 1, epoch, phase, hue_rate, interval, saturation, brightness)
+        struct.pack_into('<Q', buf, 0, seq + 2)
+
+    def publish_settings(self, settings, epoch=None, phase=None):
+        """Publishes timing/colors derived from a settings dict, keeping the hue continuous."""
+        interval, hue_rate = FrameScheduler.timing_from_settings(settings)
+        now = time.perf_counter()
+        seq, old_epoch, old_phase, old_rate, _, _, _ = self.read()
+        if epoch is None:
+            if seq == 0: epoch, phase = now, 0.0 # First publish
+            else: epoch, phase = now, (old_phase + (now - old_epoch) * old_rate) % 1.0 # Rebase at the current hue
+        self.publish(epoch, phase, hue_rate, interval, settings.get("saturation", 1.0), settings.get("brightness", 1.0))
+
+    def read(self):
+        """Returns (sequence, epoch, phase, hue_rate, interval, saturation, brightness), retrying during writes."""
+        while True:
+            values = SharedClock.LAYOUT.unpack_from(self.shm.buf, 0)
+            if values[0] % 2 == 0 and self.sequence() == values[0]: return values
+            time.sleep(0)
+
+    def close(self):
+        try:
+            self.shm.close()
+            if self.owner: self.shm.unlink()
+        except Exception as e:
+            log.debug("SharedClock.close() - %s", e)
+
+def _render_process_main(settings, monitors, selected_indices, clock_name, stop_event, first_frame=None):
+    """Entry point of one render process: a LightingController for its monitors, synced to the shared clock."""
+    configure_logging(settings) # A spawned process starts with an unconfigured logger
+    clock = SharedClock.attach(clock_name)
+    controller = LightingController(settings, monitors, selected_indices, clock=clock)
+    # The supervisor signals shutdown through stop_event; forward it to the controller from a helper thread
+    threading.Thread(target=lambda: (stop_event.wait(), controller.stop()), daemon=True).start()
+    def report_first_frame(): # ...and report the first painted frame back to it
+        controller.first_frame.wait(); first_frame.set()
+    if first_frame is not None: threading.Thread(target=report_first_frame, daemon=True).start()
+    try:
+        controller.run() # Tk runs on this process's main thread
+        if not stop_event.is_set(): dump_crash_log("render process stopped unexpectedly")
+    finally:
+        clock.close()
+
+class LightingSupervisor(threading.Thread):
+    """Runs one render process per monitor group and restarts any process that dies.
+
+    Behaves like a LightingController for EdgeRgbAppTerminal (start/stop/join/is_alive,
+    apply_settings, update_monitors). All processes follow the same SharedClock, so a
+    restarted process comes back in phase with the others. Groups are keyed by the
+    monitor_key() of their monitors, so a monitor change only restarts the groups
+    whose monitors changed. Monitor polls happen in this process, so their stats
+    are reported from here rather than by the render processes.
+    """
+    def __init__(self, settings, monitors, selected_indices):
+        super().__init__(daemon=True, name="EdgeRgbSupervisor")
+        self.settings = settings
+        self.max_restarts = settings.get("max_restarts", 5)
+        self.stats = FrameStats.from_settings(settings) # Monitor polls only; frame stats come from the render processes
+        self._ctx = multiprocessing.get_context("spawn") # Never fork a process that may own Tk state
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self.clock = None
+        self.groups = self._group_monitors(monitors, selected_indices) # group key -> (monitors, indices) to spawn with
+        self.workers = {} # group key -> Process
+        self.worker_stops = {} # group key -> multiprocessing Event telling that process to exit
+        self.restarts = {} # group key -> restart count
+        self._pending_restarts = set() # Groups to restart with new settings (rolling, one at a time)
+        self._groups_changed = False
+        self.first_frame = self._ctx.Event() # Set by the first render process to paint a frame
+        log.debug("LightingSupervisor.__init__ - Monitor groups: %s", [indices for _, indices in self.groups.values()])
+
+    def _group_monitors(self, monitors, selected_indices):
+        per_process = max(1, int(self.settings.get("monitors_per_process", 1)))
+        selected = [i for i in selected_indices if 0 <= i < len(monitors)]
+        groups = {}
+        for start in range(0, len(selected), per_process):
+            indices = selected[start:start + per_process]
+            groups[tuple(monitor_key(monitors[i]) for i in indices)] = (monitors, indices)
+        return groups
+
+    def _spawn(self, key, groups):
+        monitors, indices = groups[key]
+        stop_event = self._ctx.Event()
+        with self._lock: settings = self.settings.copy()
+        if settings.get("ddp_host") and key != min(groups, key=lambda k: min(groups[k][1])):
+            settings["ddp_host"] = "" # One LED strip, one sender: the group with the lowest monitor index drives it
+        process = self._ctx.Process(target=_render_process_main, name=f"EdgeRgbRender-{'-'.join(map(str, indices))}",
+                                    args=(settings, monitors, indices, self.clock.name, stop_event, self.first_frame), daemon=True)
+        process.start()
+        self.workers[key] = process; self.worker_stops[key] = stop_event
+        log.debug("LightingSupervisor - Started render process %s for monitors %s.", process.pid, indices)
+
+    def _reconcile_groups(self, groups):
+        """Stops processes whose monitor group disappeared and starts the new ones; others keep running."""
+        for key in [key for key in self.workers if key not in groups]:
+            log.debug("LightingSupervisor - Monitor group %s is gone, stopping its render process.", key)
+            self._stop_worker(key); self.restarts.pop(key, None)
+        for key in groups:
+            if key not in self.workers: self._spawn(key, groups)
+
+    def run(self):
+        log.debug("LightingSupervisor.run() - Thread started.")
+        try:
+            self.clock = SharedClock.create()
+            self.clock.publish_settings(self.settings)
+            with self._lock: groups = self.groups
+            for key in groups: self._spawn(key, groups)
+            while not self._stop_event.wait(0.5):
+                # update_monitors() replaces self.groups from the watcher thread: work on one snapshot per pass
+                with self._lock:
+                    groups = self.groups
+                    pending = list(self._pending_restarts); self._pending_restarts.clear()
+                    groups_changed = self._groups_changed; self._groups_changed = False
+                if groups_changed: self._reconcile_groups(groups)
+                for key in pending:
+                    if self._stop_event.is_set() or key not in self.workers or key not in groups: continue
+                    log.debug("LightingSupervisor - Restarting render process for monitors %s with new settings.", groups[key][1])
+                    self._stop_worker(key)
+                    self._spawn(key, groups)
+                for key, process in list(self.workers.items()):
+                    if process.is_alive() or self._stop_event.is_set(): continue
+                    if key not in groups: # Its group no longer exists: never restart it
+                        self._stop_worker(key); self.restarts.pop(key, None)
+                        continue
+                    count = self.restarts.get(key, 0)
+                    if count >= self.max_restarts:
+                        log.error("LightingSupervisor - Render process for monitors %s exited (code %s); restart limit reached.", groups[key][1], process.exitcode)
+                        del self.workers[key]
+                        continue
+                    log.warning("LightingSupervisor - Render process for monitors %s exited (code %s); restarting.", groups[key][1], process.exitcode)
+                    self.restarts[key] = count + 1
+                    self._spawn(key, groups)
+                if not self.workers and groups:
+                    log.error("LightingSupervisor - No render processes left.")
+                    break
+                stats = self.stats
+                if stats is not None: stats.maybe_report(time.perf_counter())
+        except Exception as e:
+            log.exception("LightingSupervisor.run() - Unexpected error: %s", e)
+        finally:
+            self._shutdown_workers()
+            log.debug("LightingSupervisor.run() - Thread finished.")
+
+    def _stop_worker(self, key):
+        process = self.workers.pop(key, None); stop_event = self.worker_stops.pop(key, None)
+        if stop_event is not None: stop_event.set()
+        if process is None: return
+        process.join(timeout=1.5)
+        if process.is_alive():
+            log.warning("LightingSupervisor - Render process %s did not exit, terminating.", process.pid)
+            process.terminate(); process.join(timeout=0.5)
+
+    def _shutdown_workers(self):
+        for stop_event in self.worker_stops.values(): stop_event.set() # Signal all first so they exit in parallel
+        for key in list(self.workers): self._stop_worker(key)
+        if self.clock: self.clock.close(); self.clock = None
+
+    def apply_settings(self, changes):
+        """Clock settings go through shared memory (next frame); anything else restarts the processes one by one."""
+        with self._lock:
+            self.settings.update(changes)
+            if "max_restarts" in changes: self.max_restarts = changes["max_restarts"]
+            if any(key.startswith("stats_") for key in changes): self.stats = FrameStats.from_settings(self.settings)
+            if set(changes) - CLOCK_SETTINGS - APP_SETTINGS: self._pending_restarts.update(self.workers) # Render processes never read APP_SETTINGS
+        if self.clock and CLOCK_SETTINGS & set(changes): self.clock.publish_settings(self.settings)
+
+    def record_monitor_poll(self, poll_ms, interval_s):
+        stats = self.stats
+        if stats is not None: stats.record_poll(poll_ms, interval_s)
+
+    def update_monitors(self, monitors, selected_indices):
+        """Regroups after a monitor change; only groups whose monitors changed are restarted."""
+        with self._lock:
+            self.groups = self._group_monitors(monitors, selected_indices)
+            self._groups_changed = True
+
+    def stop(self):
+        log.debug("LightingSupervisor.stop() called.")
+        self._stop_event.set()
+
+# --- Settings Watcher (Hot Reload) ---
+
+class SettingsWatcher(threading.Thread):
+    """Polls the settings file and calls on_change(settings) with freshly loaded settings when it changes.
+
+    Only the file's mtime/size are checked per poll. A file that is missing or
+    does not parse (e.g. half-saved by an editor) is ignored until the next change.
+    """
+    def __init__(self, load_settings, on_change, path=SETTINGS_FILE, interval_s=0.5):
+        super().__init__(daemon=True, name="EdgeRgbSettingsWatcher")
+        self.load_settings = load_settings; self.on_change = on_change
+        self.path = path; self.interval_s = max(0.05, interval_s)
+        self._stop_event = threading.Event()
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def run(self):
+        last = self._signature()
+        while not self._stop_event.wait(self.interval_s):
+            signature = self._signature()
+            if signature == last: continue
+            last = signature
+            if signature is None: continue # Deleted: keep running with the current settings
+            try:
+                with open(self.path, 'r') as f:
+                    if not isinstance(json.load(f), dict): raise ValueError("not a dict")
+            except (ValueError, OSError) as e:
+                log.warning("SettingsWatcher - Ignoring unreadable %s: %s", self.path, e)
+                continue
+            try:
+                self.on_change(self.load_settings())
+            except Exception as e:
+                log.exception("SettingsWatcher - Applying new settings failed: %s", e)
+
+    def stop(self):
+        self._stop_event.set()
+
+# --- Monitor Watcher (Hotplug) ---
+
+class MonitorWatcher(threading.Thread):
+    """Polls the monitor list and calls on_change(monitors) when monitors appear, disappear, move or resize.
+
+    Lists are compared by monitor_key(), so the only per-poll work is the
+    get_monitors() call and a tuple comparison. Each poll's CPU time (thread_time,
+    so sleeping in the display driver does not count) is passed to on_poll(ms,
+    interval_s) (fed into FrameStats) and kept in polls/poll_ms_total/poll_ms_max.
+    """
+    def __init__(self, get_monitors, on_change, interval_s=2.0, on_poll=None, monitors=None):
+        super().__init__(daemon=True, name="EdgeRgbMonitorWatcher")
+        self.get_monitors = get_monitors; self.on_change = on_change; self.on_poll = on_poll
+        self.interval_s = max(0.1, interval_s)
+        self.last_keys = [monitor_key(m) for m in monitors] if monitors is not None else None
+        self.polls = 0; self.poll_ms_total = 0.0; self.poll_ms_max = 0.0
+        self._stop_event = threading.Event()
+
+    def poll(self):
+        """Checks once; returns the new monitor list if it changed, else None."""
+        start = time.thread_time()
+        try:
+            monitors = self.get_monitors()
+        except Exception as e:
+            log.debug("MonitorWatcher.poll() - get_monitors failed: %s", e)
+            monitors = None
+        keys = [monitor_key(m) for m in monitors] if monitors is not None else None
+        poll_ms = (time.thread_time() - start) * 1000
+        self.polls += 1; self.poll_ms_total += poll_ms; self.poll_ms_max = max(self.poll_ms_max, poll_ms)
+        if self.on_poll: self.on_poll(poll_ms, self.interval_s)
+        if keys is None or keys == self.last_keys: return None
+        first = self.last_keys is None
+        self.last_keys = keys
+        return None if first else monitors
+
+    def run(self):
+        while not self._stop_event.wait(self.interval_s):
+            monitors = self.poll()
+            if monitors is None: continue
+            log.debug("MonitorWatcher - Monitor layout changed (%s monitors, poll avg %.2f ms CPU).", len(monitors), self.poll_ms_total / self.polls)
+            try:
+                self.on_change(monitors)
+            except Exception as e:
+                log.exception("MonitorWatcher - Handling monitor change failed: %s", e)
+
+    def stop(self):
+        self._stop_event.set()
 
 # --- Main Application Class (Simplified) ---
 
+FIRST_FRAME_TIMEOUT_S = 10.0 # How long start_lighting() waits for the first painted frame
+
+def parse_monitor_selection(text, monitors, strict=True):
+    """Parses "all", "primary", "" (= primary) or "0,2" into (sorted indices, selection mode).
+
+    Raises ValueError with a user-facing message. With strict=False, indices of
+    monitors that are not connected are skipped with a warning instead (unattended starts).
+    """
+    text = (text or "").strip().lower()
+    if text == 'all': return list(range(len(monitors))), "all"
+    if text in ('', 'primary'):
+        primary = [i for i, m in enumerate(monitors) if getattr(m, 'is_primary', False)][:1]
+        if not primary: raise ValueError("Could not determine primary monitor. Please enter a number or 'all'.")
+        return primary, "primary"
+    indices = []
+    max_index = len(monitors) - 1
+    for part in text.split(','):
+        part = part.strip()
+        if not part: continue # Skip empty parts like in "0,,1"
+        if not part.isdigit(): raise ValueError(f"Input '{part}' is not a valid number.")
+        index = int(part)
+        if not 0 <= index <= max_index:
+            if strict: raise ValueError(f"Monitor number '{index}' is out of range (0-{max_index}).")
+            log.warning("Monitor %s is not connected (0-%s available). Skipping it.", index, max_index)
+            continue
+        if index not in indices: indices.append(index)
+    if not indices: raise ValueError("No valid monitor numbers entered. Please try again.")
+    return sorted(indices), "list"
+
 class EdgeRgbAppTerminal:
-    def __init__(self):
-        print("DEBUG: EdgeRgbAppTerminal.__init__ - Start")
+    def __init__(self, monitor_spec=None):
+        log.debug("EdgeRgbAppTerminal.__init__ - Start")
+        self.launch_time = time.perf_counter()
+        self.monitor_spec = monitor_spec # --monitors from the command line; overrides "startup_monitors"
+        self.time_to_first_frame_ms = None
         self.settings = self.load_settings() # Load non-monitor settings
+        configure_logging(self.settings)
         self.monitors = []
         try:
             self.monitors = screeninfo.get_monitors()
         except screeninfo.common.ScreenInfoError as e:
-            print(f"ERROR getting monitor info: {e}")
+            log.error("Getting monitor info failed: %s", e)
         except Exception as e:
-            print(f"UNEXPECTED ERROR getting monitor info: {e}")
-            traceback.print_exc()
+            log.exception("Unexpected error getting monitor info: %s", e)
 
         self.lighting_thread = None
         self.selected_monitor_indices = []
+        self.selection_mode = "list" # "primary", "all" or "list"; decides what to light after a monitor change
+        self.selected_monitor_ids = set() # monitor_identity() of the selected monitors ("list" mode)
+        self.settings_watcher = None
+        self.monitor_watcher = None
+        self._lighting_lock = threading.RLock() # Serializes start/stop/reconfigure between main loop and watcher
 
-        print(f"DEBUG: EdgeRgbAppTerminal.__init__ - Settings loaded: {self.settings}")
-        print("DEBUG: EdgeRgbAppTerminal.__init__ - End")
+        log.debug("EdgeRgbAppTerminal.__init__ - Settings loaded: %s", self.settings)
+        log.debug("EdgeRgbAppTerminal.__init__ - End")
 
     def load_settings(self):
         """Loads settings, ignoring 'selected_monitors' and 'enabled'."""
-        print(f"DEBUG: load_settings() - Attempting to load '{SETTINGS_FILE}'...")
+        log.debug("load_settings() - Attempting to load '%s'...", SETTINGS_FILE)
         loaded_settings = {}
         if os.path.exists(SETTINGS_FILE):
             try:
                 with open(SETTINGS_FILE, 'r') as f:
                     loaded_settings = json.load(f)
-                print("DEBUG: load_settings() - File found and loaded.")
+                log.debug("load_settings() - File found and loaded.")
                 if not isinstance(loaded_settings, dict):
-                    print(f"ERROR: Invalid format in {SETTINGS_FILE} (not a dict). Using defaults only.")
+                    log.error("Invalid format in %s (not a dict). Using defaults only.", SETTINGS_FILE)
                     loaded_settings = {}
             except json.JSONDecodeError as e:
-                print(f"ERROR: Could not decode {SETTINGS_FILE}: {e}. Using defaults only.")
+                log.error("Could not decode %s: %s. Using defaults only.", SETTINGS_FILE, e)
                 loaded_settings = {}
             except Exception as e:
-                 print(f"ERROR loading settings from {SETTINGS_FILE}: {e}. Using defaults only.")
-                 traceback.print_exc()
+                 log.exception("Loading settings from %s failed: %s. Using defaults only.", SETTINGS_FILE, e)
                  loaded_settings = {}
         else:
-            print(f"DEBUG: load_settings() - {SETTINGS_FILE} not found. Using defaults only.")
+            log.debug("load_settings() - %s not found. Using defaults only.", SETTINGS_FILE)
 
         # Apply defaults for keys not found in the file
         final_settings = DEFAULT_SETTINGS.copy() # Start with defaults
@@ -290,7 +2477,7 @@ class EdgeRgbAppTerminal:
 
     def save_settings(self):
         """Saves settings, excluding 'selected_monitors' and 'enabled'."""
-        print(f"DEBUG: save_settings() - Saving to '{SETTINGS_FILE}'")
+        log.debug("save_settings() - Saving to '%s'", SETTINGS_FILE)
         settings_to_save = self.settings.copy()
         settings_to_save.pop("selected_monitors", None)
         settings_to_save.pop("enabled", None)
@@ -298,10 +2485,9 @@ class EdgeRgbAppTerminal:
         try:
             with open(SETTINGS_FILE, 'w') as f:
                 json.dump(settings_to_save, f, indent=4)
-            print("DEBUG: save_settings() - Save successful.")
+            log.debug("save_settings() - Save successful.")
         except Exception as e:
-            print(f"ERROR saving settings to {SETTINGS_FILE}: {e}")
-            traceback.print_exc()
+            log.exception("Saving settings to %s failed: %s", SETTINGS_FILE, e)
 
     def select_monitors_terminal(self):
         """Displays monitors and prompts user for selection via terminal input."""
@@ -328,113 +2514,163 @@ class EdgeRgbAppTerminal:
 
         while True:
             try:
+                if sys.stdin is None: raise EOFError # pythonw / detached process: no stdin at all
                 raw_input = input(prompt).strip().lower() # Read input, trim whitespace, make lowercase
-
-                # Option 1: Empty input (Default to Primary)
-                if not raw_input:
-                     if primary_index != -1:
-                         self.selected_monitor_indices = [primary_index]
-                         print(f"Defaulting to primary monitor: {self.selected_monitor_indices}")
-                         return True
-                     else:
-                          print("Could not determine primary monitor. Please enter a number or 'all'.")
-                          continue # Re-prompt
-
-                # Option 2: Select 'all'
-                elif raw_input == 'all':
-                     self.selected_monitor_indices = list(range(len(self.monitors)))
-                     print(f"Selected ALL monitors: {self.selected_monitor_indices}")
-                     return True
-
-                # Option 3: Comma-separated numbers
-                else:
-                    selected_strings = [s.strip() for s in raw_input.split(',')]
-                    selected_indices_temp = []
-                    valid_input = True
-                    max_index = len(self.monitors) - 1
-
-                    for s in selected_strings:
-                        if not s: continue # Skip empty parts like in "0,,1"
-                        if not s.isdigit():
-                            print(f"Error: Input '{s}' is not a valid number.")
-                            valid_input = False
-                            break
-                        index = int(s)
-                        if 0 <= index <= max_index:
-                            if index not in selected_indices_temp:
-                                selected_indices_temp.append(index)
-                        else:
-                            print(f"Error: Monitor number '{index}' is out of range (0-{max_index}).")
-                            valid_input = False
-                            break
-
-                    if valid_input and selected_indices_temp:
-                        self.selected_monitor_indices = sorted(selected_indices_temp)
-                        print(f"Selected monitors: {self.selected_monitor_indices}")
-                        return True
-                    elif valid_input and not selected_indices_temp:
-                         print("No valid monitor numbers entered. Please try again.")
-                    # If not valid_input, error was already printed
-
-            except ValueError: # Should be caught by isdigit now, but as fallback
-                print("Error: Invalid input. Please enter numbers (0,1), 'all', or leave blank.")
+                self.selected_monitor_indices, mode = parse_monitor_selection(raw_input, self.monitors)
+                self._remember_selection(mode)
+                if mode == "primary": print(f"Defaulting to primary monitor: {self.selected_monitor_indices}")
+                elif mode == "all": print(f"Selected ALL monitors: {self.selected_monitor_indices}")
+                else: print(f"Selected monitors: {self.selected_monitor_indices}")
+                return True
+            except ValueError as e:
+                print(f"Error: {e}")
+            except EOFError: # stdin closed or empty (e.g. started from a service): nothing more will come
+                print("\nNo input available; using the primary monitor (pass --monitors to choose).")
+                return self.select_monitors_from_spec("primary")
             except Exception as e:
                  print(f"An unexpected error occurred during input: {e}")
-                 traceback.print_exc()
+                 log.debug("select_monitors_terminal() - Input failed", exc_info=True)
                  return False # Exit selection on error
 
+    def select_monitors_from_spec(self, spec):
+        """Non-interactive selection from --monitors / "startup_monitors" ("all", "primary" or "0,2")."""
+        if not self.monitors:
+            print("No monitors detected. Cannot start lighting.")
+            return False
+        try:
+            self.selected_monitor_indices, mode = parse_monitor_selection(spec, self.monitors, strict=False)
+        except ValueError as e:
+            print(f"Error: Invalid monitor selection '{spec}': {e}")
+            return False
+        self._remember_selection(mode)
+        print(f"Selected monitors ({spec}): {self.selected_monitor_indices}")
+        return True
+
+    def _remember_selection(self, mode):
+        self.selection_mode = mode
+        self.selected_monitor_ids = {monitor_identity(self.monitors[i]) for i in self.selected_monitor_indices}
+
+    def _resolve_selection(self, monitors):
+        """Selected indices in a new monitor list, following the selection mode."""
+        if self.selection_mode == "all": return list(range(len(monitors)))
+        if self.selection_mode == "primary":
+            return [i for i, m in enumerate(monitors) if getattr(m, 'is_primary', False)][:1]
+        if len(monitors) == len(self.monitors) and not any(getattr(m, 'name', None) for m in monitors):
+            return list(self.selected_monitor_indices) # Same count and no names to go by: a mode change, not a hotplug
+        return [i for i, m in enumerate(monitors) if monitor_identity(m) in self.selected_monitor_ids]
+
+    def start_monitor_watcher(self):
+        """Starts following monitor hotplug/resolution changes."""
+        if not self.settings.get("monitor_watch", True) or self.monitor_watcher: return
+        self.monitor_watcher = MonitorWatcher(screeninfo.get_monitors, self._on_monitors_changed, self.settings.get("monitor_poll_s", 2.0),
+                                              on_poll=self._on_monitor_poll, monitors=self.monitors)
+        self.monitor_watcher.start()
+        log.debug("start_monitor_watcher() - Watching for monitor changes.")
+
+    def _on_monitor_poll(self, poll_ms, interval_s):
+        record = getattr(self.lighting_thread, 'record_monitor_poll', None)
+        if record: record(poll_ms, interval_s)
+
+    def _on_monitors_changed(self, monitors):
+        with self._lighting_lock:
+            selected = self._resolve_selection(monitors) # Compares against the previous list
+            self.monitors = monitors
+            self.selected_monitor_indices = selected
+            if self.selection_mode == "list": self._remember_selection("list") # Unnamed monitors are known by position, which may have moved
+            log.info("Monitors changed: now %s detected, lighting %s", len(monitors), self.selected_monitor_indices)
+            thread = self.lighting_thread
+            if thread and thread.is_alive(): thread.update_monitors(monitors, self.selected_monitor_indices)
+
     def start_lighting(self):
         """Starts the LightingController thread with current settings and selection."""
-        print("DEBUG: start_lighting() - Entered")
+        with self._lighting_lock: self._start_lighting()
+
+    def _start_lighting(self):
+        log.debug("start_lighting() - Entered")
         # Stop previous thread first (if any)
         if self.lighting_thread and self.lighting_thread.is_alive():
-            print("DEBUG: start_lighting() - Previous thread found alive, stopping it.")
-            self.stop_lighting()
+            log.debug("start_lighting() - Previous thread found alive, stopping it.")
+            self._stop_lighting()
         elif self.lighting_thread:
             self.lighting_thread = None # Clear ref if exists but not alive
 
         if not self.selected_monitor_indices:
-            print("DEBUG: start_lighting() - No monitors selected, not starting thread.")
+            log.debug("start_lighting() - No monitors selected, not starting thread.")
             return
 
-        print(f"DEBUG: start_lighting() - Starting thread for monitors: {self.selected_monitor_indices}")
+        log.debug("start_lighting() - Starting thread for monitors: %s", self.selected_monitor_indices)
         try:
             # Pass settings and the selected indices
-            self.lighting_thread = LightingController(
+            controller_class = LightingSupervisor if self.settings.get("process_per_monitor", False) else LightingController
+            self.lighting_thread = controller_class(
                 self.settings.copy(), # Pass copy of non-monitor settings
                 self.monitors,
                 self.selected_monitor_indices.copy() # Pass copy of selection
             )
+            started = time.perf_counter()
             self.lighting_thread.start()
-            print("DEBUG: start_lighting() - lighting_thread.start() called.")
-            time.sleep(0.05)
-            if self.lighting_thread.is_alive():
-                print("DEBUG: start_lighting() - lighting_thread is alive after start.")
+            log.debug("start_lighting() - lighting_thread.start() called.")
+            # Wait for the first painted frame instead of a fixed sleep; stop waiting if the thread dies
+            painted = False; deadline = started + FIRST_FRAME_TIMEOUT_S
+            while self.lighting_thread.is_alive() and time.perf_counter() < deadline:
+                if self.lighting_thread.first_frame.wait(0.05): painted = True; break
+            if not painted and not self.lighting_thread.is_alive():
+                log.error("start_lighting() - lighting_thread is NOT alive shortly after start.")
+            elif painted:
+                now = time.perf_counter()
+                self.time_to_first_frame_ms = (now - started) * 1000
+                log.info("Time to first frame: %.0f ms (%.0f ms since launch)", self.time_to_first_frame_ms, (now - self.launch_time) * 1000)
             else:
-                print("ERROR: start_lighting() - lighting_thread is NOT alive shortly after start.")
+                log.warning("start_lighting() - No frame painted within %.0f s; lighting keeps starting in the background.", FIRST_FRAME_TIMEOUT_S)
         except Exception as e:
-            print(f"ERROR: start_lighting() - Exception during thread creation/start: {e}")
-            traceback.print_exc()
+            log.exception("start_lighting() - Exception during thread creation/start: %s", e)
             self.lighting_thread = None
-        print("DEBUG: start_lighting() - Exiting function.")
+        log.debug("start_lighting() - Exiting function.")
 
     def stop_lighting(self):
         """Stops the LightingController thread."""
+        with self._lighting_lock: self._stop_lighting()
+
+    def _stop_lighting(self):
         thread_to_stop = self.lighting_thread
         if thread_to_stop and thread_to_stop.is_alive():
-            print("DEBUG: stop_lighting() - Thread found alive, attempting stop...")
+            log.debug("stop_lighting() - Thread found alive, attempting stop...")
             thread_to_stop.stop()
-            print("DEBUG: stop_lighting() - Joining thread (timeout 2s)...")
+            log.debug("stop_lighting() - Joining thread (timeout 2s)...")
             thread_to_stop.join(timeout=2.0)
-            if thread_to_stop.is_alive(): print("ERROR: stop_lighting() - Thread did not stop gracefully.")
-            else: print("DEBUG: stop_lighting() - Thread stopped and joined.")
+            if thread_to_stop.is_alive(): log.error("stop_lighting() - Thread did not stop gracefully.")
+            else: log.debug("stop_lighting() - Thread stopped and joined.")
         # Clear reference
         if self.lighting_thread == thread_to_stop: self.lighting_thread = None
 
 
+    def start_settings_watcher(self):
+        """Starts watching the settings file so edits apply to the running lights."""
+        if not self.settings.get("settings_watch", True) or self.settings_watcher: return
+        self.settings_watcher = SettingsWatcher(self.load_settings, self._on_settings_changed, SETTINGS_FILE, self.settings.get("settings_poll_s", 0.5))
+        self.settings_watcher.start()
+        log.debug("start_settings_watcher() - Watching '%s'.", SETTINGS_FILE)
+
+    def _on_settings_changed(self, new_settings):
+        changes = {key: value for key, value in new_settings.items() if self.settings.get(key) != value}
+        if not changes: return
+        log.info("Settings changed: %s", changes)
+        with self._lighting_lock:
+            self.settings.update(changes)
+            if any(key.startswith("log_") for key in changes): configure_logging(self.settings)
+            thread = self.lighting_thread
+            if not thread or not thread.is_alive(): return
+            if RESTART_SETTINGS & set(changes):
+                log.debug("_on_settings_changed() - Change needs a restart of the lighting.")
+                self._start_lighting()
+            else:
+                thread.apply_settings(changes)
+
     def shutdown(self):
         """Performs clean shutdown."""
-        print("DEBUG: shutdown() - Initiating shutdown...")
+        log.debug("shutdown() - Initiating shutdown...")
+        if self.settings_watcher: self.settings_watcher.stop(); self.settings_watcher = None
+        if self.monitor_watcher: self.monitor_watcher.stop(); self.monitor_watcher = None
         self.stop_lighting()
         # Save other settings if desired?
         # self.save_settings()
@@ -444,7 +2680,10 @@ class EdgeRgbAppTerminal:
         """Main application entry point."""
         print("--- Edge RGB (Terminal Control) ---")
 
-        if not self.select_monitors_terminal():
+        spec = self.monitor_spec if self.monitor_spec is not None else self.settings.get("startup_monitors", "")
+        if spec: selected = self.select_monitors_from_spec(spec)
+        else: selected = self.select_monitors_terminal() # Also reads a piped selection (echo 0,1 | python edge_rgb.py)
+        if not selected:
             print("Monitor selection failed or cancelled. Exiting.")
             return # Exit if selection fails
 
@@ -456,13 +2695,17 @@ class EdgeRgbAppTerminal:
              return
 
         print("\nRGB lighting effect started. Press Ctrl+C to stop.")
+        self.start_settings_watcher()
+        self.start_monitor_watcher()
 
         # Keep the main thread alive until Ctrl+C
         try:
             while True:
-                # Check if the lighting thread died unexpectedly
-                if not self.lighting_thread.is_alive():
-                     print("\nERROR: Lighting thread stopped unexpectedly. Exiting.")
+                # Check if the lighting thread died unexpectedly (under the lock: the watcher may be restarting it)
+                with self._lighting_lock: alive = self.lighting_thread is not None and self.lighting_thread.is_alive()
+                if not alive:
+                     log.error("Lighting thread stopped unexpectedly. Exiting.")
+                     dump_crash_log("lighting stopped unexpectedly")
                      break
                 time.sleep(1) # Keep main thread alive but idle
         except KeyboardInterrupt:
@@ -473,20 +2716,26 @@ class EdgeRgbAppTerminal:
 
 # --- Main Execution Block ---
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Animated RGB lighting on the edges of your monitors.")
+    parser.add_argument("--monitors", metavar="SPEC", help="Monitors to light without prompting: all, primary or a list like 0,2")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
     print("--- Script Execution Start ---")
+    args = parse_args()
     app = None
     try:
-        print("DEBUG: Initializing EdgeRgbAppTerminal...")
-        app = EdgeRgbAppTerminal()
-        print("DEBUG: Starting EdgeRgbAppTerminal.run()...")
+        log.debug("Initializing EdgeRgbAppTerminal...")
+        app = EdgeRgbAppTerminal(monitor_spec=args.monitors)
+        log.debug("Starting EdgeRgbAppTerminal.run()...")
         app.run() # Contains the main loop now
-        print("DEBUG: EdgeRgbAppTerminal.run() returned.")
+        log.debug("EdgeRgbAppTerminal.run() returned.")
     except Exception as e_main:
-        print(f"\nFATAL ERROR in main execution scope: {e_main}")
-        traceback.print_exc()
+        log.critical("Fatal error in main execution scope: %s", e_main, exc_info=True)
+        dump_crash_log("fatal error")
         if app:
-             print("DEBUG: Attempting shutdown after fatal error.")
+             log.debug("Attempting shutdown after fatal error.")
              app.shutdown() # Attempt cleanup
     finally:
         # No lock file handling needed in this version
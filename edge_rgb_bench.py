@@ -0,0 +1,129 @@
+# edge_rgb_bench.py
+#
+# Headless benchmark for the Edge RGB frame pipeline. Runs the same layout, color
+# computation and diffing code as the live LightingController against fake
+# monitors, without Tk windows or a display, and reports frames per second and
+# per-frame latency for every combination of the swept parameters.
+#
+# Example:
+#   python edge_rgb_bench.py --monitors 1,3 --resolutions 1920x1080,3840x2160 --segment-lens 30,5,1 --backends rectangles,image
+#   python edge_rgb_bench.py --engines python,numpy --effects rainbow,chase --sink null
+#   python edge_rgb_bench.py --sink diff --allocations
+#   python edge_rgb_bench.py --sink ddp --segment-lens 10 --backends rectangles
+#   python edge_rgb_bench.py --effects ambient --ambient-source synthetic
+
+import argparse
+import json
+import threading
+import time
+import tracemalloc
+
+import edge_rgb
+
+def make_ddp_sink():
+    """DdpSink sending to a local DdpReceiver, drained on a background thread."""
+    receiver = edge_rgb.DdpReceiver()
+    def drain():
+        while receiver.receive(1.0) is not None: pass
+    threading.Thread(target=drain, daemon=True).start()
+    return edge_rgb.DdpSink(*receiver.address, keepalive_s=0)
+
+SINKS = {
+    "script": edge_rgb.TclScriptSink, # Diff + build the Tcl payload a batched frame would send (default)
+    "record": edge_rgb.RecordingSink, # Diff + keep the changes in memory
+    "diff": edge_rgb.FrameSink,       # Diff only (what the immediate Tk sink does before its Tcl calls)
+    "null": edge_rgb.NullSink,        # Frame computation only
+    "ddp": make_ddp_sink,             # Map onto LEDs + send DDP packets to a local UDP listener
+}
+
+def parse_list(text, convert=str):
+    return [convert(part.strip()) for part in text.split(',') if part.strip()]
+
+def parse_resolution(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+def run_case(monitor_count, resolution, segment_len, backend, frames, settings, sink_name="script", engine="python", effect="rainbow", allocations=False):
+    """Renders 'frames' frames for one configuration and returns a result dict.
+
+    With allocations=True every frame runs under tracemalloc and the result also holds
+    the mean peak of memory allocated within a frame (alloc_kb); timings are then
+    inflated by tracing and should not be compared with untraced runs.
+    """
+    settings = dict(edge_rgb.DEFAULT_SETTINGS, **settings)
+    settings["segment_len"] = segment_len; settings["render_backend"] = backend
+    settings["engine"] = engine; settings["effect"] = effect
+    generator = edge_rgb.FrameGenerator(settings)
+    sink = SINKS[sink_name]()
+    total_segments = 0
+    for index, monitor in enumerate(edge_rgb.fake_monitors(monitor_count, *resolution)):
+        layout = edge_rgb.MonitorLayout(monitor, settings["thickness"], segment_len)
+        generator.add_monitor(index, layout)
+        sink.add_monitor(index, layout, whole_edges=(backend == "image"))
+        total_segments += layout.total_segments
+    generator.compute(0.0) # Build palette/engine outside the timed loop, like the live controller after its first frame
+
+    hue_step = settings["hue_speed"] # One update_ms tick of animation per frame
+    frame_ms = [0.0] * frames; alloc_bytes = 0
+    if allocations: tracemalloc.start()
+    started = time.perf_counter()
+    for i in range(frames):
+        if allocations: tracemalloc.reset_peak(); before = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        sink.submit(generator.compute((i * hue_step) % 1.0))
+        frame_ms[i] = (time.perf_counter() - t0) * 1000
+        if allocations: alloc_bytes += tracemalloc.get_traced_memory()[1] - before
+    elapsed = time.perf_counter() - started
+    if allocations: tracemalloc.stop()
+
+    latency = edge_rgb.FrameStats._percentiles(frame_ms)
+    return {
+        "monitors": monitor_count, "resolution": f"{resolution[0]}x{resolution[1]}",
+        "segment_len": segment_len, "backend": backend, "sink": sink_name,
+        "engine": engine if engine != "numpy" or edge_rgb.np is not None else "python", "effect": effect,
+        "segments": total_segments, "frames": frames,
+        "fps": round(frames / max(1e-9, elapsed), 1),
+        "mean_ms": round(sum(frame_ms) / max(1, len(frame_ms)), 3),
+        "p50_ms": latency["p50"], "p95_ms": latency["p95"], "p99_ms": latency["p99"],
+        "updates_per_frame": round(sink.total_updates / max(1, frames), 1), "skips_per_frame": round(sink.total_skips / max(1, frames), 1),
+        "alloc_kb": round(alloc_bytes / max(1, frames) / 1024, 3) if allocations else None,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless Edge RGB frame pipeline benchmark.")
+    parser.add_argument("--monitors", default="1,2,3", help="Comma-separated monitor counts (default: 1,2,3)")
+    parser.add_argument("--resolutions", default="1920x1080,3840x2160", help="Comma-separated WxH list")
+    parser.add_argument("--segment-lens", default="30,10,1", help="Comma-separated segment_len values")
+    parser.add_argument("--backends", default="rectangles,image", help="Comma-separated render backends")
+    parser.add_argument("--engines", default="python", help="Comma-separated color engines: python, numpy (default: python)")
+    parser.add_argument("--effects", default="rainbow", help="Comma-separated effects (default: rainbow)")
+    parser.add_argument("--ambient-source", default="synthetic", help="Input for the ambient effect: synthetic, screen or an image/.npy path (default: synthetic)")
+    parser.add_argument("--sink", default="script", choices=sorted(SINKS), help="Frame sink to measure (default: script)")
+    parser.add_argument("--cycle-cache", action="store_true", help="Enable the in-memory cycle cache (frames repeat after one hue cycle)")
+    parser.add_argument("--allocations", action="store_true", help="Trace memory allocated per frame with tracemalloc (slows the run down)")
+    parser.add_argument("--frames", type=int, default=200, help="Frames per case (default: 200)")
+    parser.add_argument("--json", metavar="FILE", help="Also append results to FILE as JSON lines")
+    args = parser.parse_args(argv)
+
+    header = f"{'mon':>3} {'resolution':>10} {'seg':>4} {'backend':>10} {'engine':>6} {'effect':>9} {'segments':>8} {'updates':>8} {'fps':>9} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8}" + (f" {'alloc_kb':>9}" if args.allocations else "")
+    print(header); print('-' * len(header))
+    results = []
+    settings = {"cycle_cache": True} if args.cycle_cache else {}
+    settings["ambient_source"] = args.ambient_source
+    for monitor_count in parse_list(args.monitors, int):
+        for resolution in parse_list(args.resolutions, parse_resolution):
+            for segment_len in parse_list(args.segment_lens, int):
+                for backend in parse_list(args.backends):
+                    for engine in parse_list(args.engines):
+                        for effect in parse_list(args.effects):
+                            r = run_case(monitor_count, resolution, segment_len, backend, args.frames, settings, args.sink, engine, effect, args.allocations)
+                            results.append(r)
+                            print(f"{r['monitors']:>3} {r['resolution']:>10} {r['segment_len']:>4} {r['backend']:>10} {r['engine']:>6} {r['effect']:>9} {r['segments']:>8} {r['updates_per_frame']:>8.1f} "
+                                  f"{r['fps']:>9.1f} {r['mean_ms']:>8.3f} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} {r['p99_ms']:>8.3f}" + (f" {r['alloc_kb']:>9.3f}" if args.allocations else ""))
+    if args.json:
+        with open(args.json, 'a') as f:
+            for r in results: f.write(json.dumps(r) + "\n")
+    return results
+
+if __name__ == "__main__":
+    main()
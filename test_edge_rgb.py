@@ -0,0 +1,237 @@
+# test_edge_rgb.py
+"""Headless regression tests for the frame pipeline (no display needed): python -m pytest"""
+
+import colorsys
+import math
+from array import array
+
+import pytest
+
+import edge_rgb
+from edge_rgb import DdpReceiver, DdpSink, FakeMonitor, FrameGenerator, MonitorLayout, RecordingSink, fake_monitors
+
+OFFSETS = [0.0, 0.013, 0.25, 0.5, 0.731, 0.999]
+
+def make_generator(monitors=2, width=1920, height=1080, **overrides):
+    settings = dict(edge_rgb.DEFAULT_SETTINGS, **overrides)
+    generator = FrameGenerator(settings)
+    for index, monitor in enumerate(fake_monitors(monitors, width, height)):
+        generator.add_monitor(index, MonitorLayout(monitor, settings["thickness"], settings["segment_len"]))
+    return generator
+
+def unpack(color):
+    return (color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF
+
+def old_get_color(segment_index, total_segments, hue_offset, saturation, brightness):
+    """The original per-segment colorsys computation the palette replaced."""
+    r, g, b = colorsys.hsv_to_rgb((hue_offset + segment_index / max(1, total_segments)) % 1.0, saturation, brightness)
+    return int(r*255), int(g*255), int(b*255)
+
+@pytest.mark.parametrize("saturation, brightness", [(1.0, 1.0), (0.6, 0.8)])
+def test_palette_matches_colorsys_within_one_step(saturation, brightness):
+    generator = make_generator(engine="python", saturation=saturation, brightness=brightness)
+    steps = generator.get_palette().resolution
+    tolerance = 6 * 255 / steps + 1 # Largest channel change over one hue step, plus truncation
+    for offset in OFFSETS:
+        frame = generator.compute(offset)
+        for colors in frame.values():
+            for n, color in enumerate(colors):
+                expected = old_get_color(n, len(colors), offset, saturation, brightness)
+                assert max(abs(a - b) for a, b in zip(unpack(color), expected)) <= tolerance
+
+@pytest.mark.skipif(edge_rgb.np is None, reason="NumPy not installed")
+@pytest.mark.parametrize("effect", ["rainbow", "gradient", "breathing", "chase"])
+def test_numpy_engine_matches_python(effect):
+    python = make_generator(monitors=3, width=2560, height=1440, segment_len=7, engine="python", effect=effect, saturation=0.9, brightness=0.7)
+    vectorized = make_generator(monitors=3, width=2560, height=1440, segment_len=7, engine="numpy", effect=effect, saturation=0.9, brightness=0.7)
+    for offset in OFFSETS + [i / 97 for i in range(97)]:
+        expected = {i: list(colors) for i, colors in python.compute(offset).items()}
+        assert {i: list(colors) for i, colors in vectorized.compute(offset).items()} == expected, offset
+
+def test_recording_sink_only_emits_changes():
+    generator = make_generator(monitors=1, engine="python")
+    sink = RecordingSink()
+    for index, layout in generator.layouts.items(): sink.add_monitor(index, layout)
+    sink.submit(generator.compute(0.1))
+    assert len(sink.frames[-1]) == generator.layouts[0].total_segments
+    sink.submit(generator.compute(0.1))
+    assert sink.frames[-1] == [] and sink.frame_updates == 0
+    frame = generator.compute(0.2)
+    sink.submit(frame)
+    edges = {edge.name: edge for edge in generator.layouts[0].edges}
+    for _, edge_name, list_index, color in sink.frames[-1]:
+        assert f"#{frame[0][edges[edge_name].order[list_index]]:06x}" == color
+    assert sink.frame_updates == len(sink.frames[-1]) > 0
+
+@pytest.mark.parametrize("led_count, led_offset, reverse", [(0, 0, False), (1000, 0, False), (37, 5, True)])
+def test_ddp_packets_carry_the_frame(led_count, led_offset, reverse):
+    generator = make_generator(engine="python")
+    receiver = DdpReceiver()
+    sink = DdpSink(receiver.address[0], receiver.address[1], led_count, led_offset, reverse)
+    try:
+        for index, layout in generator.layouts.items(): sink.add_monitor(index, layout)
+        frame = generator.compute(0.3)
+        sink.submit(frame)
+        pixels = receiver.receive()
+        joined = [color for index in sorted(frame) for color in frame[index]]
+        count = led_count or len(joined)
+        assert pixels is not None and len(pixels) == count * 3
+        assert receiver.packets == -(-count // edge_rgb.DDP_MAX_PIXELS)
+        for led in range(count):
+            position = (led - led_offset) % count
+            if reverse: position = (count - position) % count
+            assert tuple(pixels[led * 3:led * 3 + 3]) == unpack(joined[position * len(joined) // count]), led
+        sink.collect(frame)
+        assert not sink.flush(sink.last_send) # Unchanged and keepalive not due: nothing is sent
+    finally:
+        sink.close(); receiver.close()
+
+def test_cycle_cache_round_trips_through_mmap(tmp_path):
+    settings = dict(hue_speed=0.05, effect="chase", engine="python", cycle_cache=True, cycle_cache_dir=str(tmp_path))
+    first = make_generator(**settings)
+    frames_per_cycle = first.get_cycle_cache().frames_per_cycle
+    expected = [{i: list(colors) for i, colors in first.compute(slot / frames_per_cycle).items()} for slot in range(frames_per_cycle)]
+    first.get_cycle_cache().close()
+    assert len(list(tmp_path.iterdir())) == 1
+
+    second = make_generator(**settings)
+    cache = second.get_cycle_cache()
+    assert cache._mmap is not None and cache.remaining == 0
+    live = make_generator(**dict(settings, cycle_cache=False))
+    for slot in range(frames_per_cycle):
+        frame = {i: list(colors) for i, colors in second.compute(slot / frames_per_cycle).items()}
+        assert frame == expected[slot] == {i: list(colors) for i, colors in live.compute(slot / frames_per_cycle).items()}
+    cache.close()
+
+def test_cycle_cache_ignores_a_damaged_file(tmp_path):
+    settings = dict(hue_speed=0.1, engine="python", cycle_cache=True, cycle_cache_dir=str(tmp_path))
+    first = make_generator(**settings)
+    for slot in range(10): first.compute(slot / 10)
+    first.get_cycle_cache().close()
+    path = next(tmp_path.iterdir())
+    path.write_bytes(path.read_bytes()[:-4]) # Truncated, e.g. by a crash while copying
+    cache = make_generator(**settings).get_cycle_cache()
+    assert cache._mmap is None and cache.remaining == 10
+    cache.close()
+
+def test_monitor_watcher_reports_only_real_changes():
+    monitors = fake_monitors(2)
+    polls = []
+    watcher = edge_rgb.MonitorWatcher(lambda: monitors, None, 1.5, on_poll=lambda ms, interval_s: polls.append((ms, interval_s)))
+    assert watcher.poll() is None # First poll only takes the baseline
+    assert watcher.poll() is None
+    monitors = fake_monitors(2) # Same geometry, new objects: not a change
+    assert watcher.poll() is None
+    monitors = [monitors[0], FakeMonitor(1920, 0, 2560, 1440, name="FAKE1")]
+    assert watcher.poll() is monitors
+    assert watcher.poll() is None
+    def unplugged(): raise OSError("display gone")
+    watcher.get_monitors = unplugged
+    assert watcher.poll() is None and watcher.last_keys == [edge_rgb.monitor_key(m) for m in monitors] # A failed poll keeps the baseline
+    assert len(polls) == watcher.polls == 6 and all(ms >= 0 and interval_s == 1.5 for ms, interval_s in polls)
+
+class HeadlessController(edge_rgb.LightingController):
+    """LightingController whose monitors are registered without creating Tk windows."""
+    def __init__(self, monitors, selected_indices):
+        super().__init__(dict(edge_rgb.DEFAULT_SETTINGS), monitors, selected_indices)
+        self.sink = RecordingSink(); self.created = []; self.relaid = []
+        for i in selected_indices: self._create_monitor_lights(monitors[i], i)
+
+    def _create_monitor_lights(self, monitor, monitor_index):
+        self.created.append(monitor_index)
+        self._register_monitor(monitor_index, self._layout_for(monitor), {}, {}, {})
+
+    def _relayout_monitor(self, monitor_index):
+        self.relaid.append(monitor_index)
+        self._register_monitor(monitor_index, self._layout_for(self.monitors[monitor_index]), {}, {}, {})
+
+def test_reconcile_monitors_touches_only_changed_monitors():
+    monitors = fake_monitors(3)
+    controller = HeadlessController(monitors, [0, 1, 2])
+    kept = controller.monitor_elements[0]
+    # FAKE1 is unplugged, FAKE2 moves into its place with a new resolution, FAKE3 appears
+    new = [monitors[0], FakeMonitor(1920, 0, 2560, 1440, name="FAKE2"), FakeMonitor(4480, 0, 1280, 1024, name="FAKE3")]
+    controller.created.clear()
+    controller._reconcile_monitors(new, [0, 1, 2])
+    assert controller.monitor_elements[0] is kept # Unchanged monitor: left alone
+    assert controller.relaid == [1] and controller.created == [2]
+    assert sorted(controller.generator.layouts) == sorted(controller.sink.layouts) == sorted(controller.monitor_elements) == [0, 1, 2]
+    assert (controller.generator.layouts[1].width, controller.generator.layouts[2].width) == (2560, 1280)
+    controller._reconcile_monitors(new, [1])
+    assert sorted(controller.generator.layouts) == sorted(controller.sink.layouts) == sorted(controller.monitor_elements) == [1]
+
+def brute_force_band_means(desktop, layout, band_px):
+    """Mean color of each segment's screen band, computed pixel by pixel from the segment geometry."""
+    t = int(layout.thickness); x0, y0, w, h = layout.x, layout.y, layout.width, layout.height
+    expected = {}
+    for edge in layout.edges:
+        seg_len = edge.seg_w if edge.orientation == 'horizontal' else edge.seg_h
+        end = (w if edge.orientation == 'horizontal' else h) - t
+        for j in range(edge.count):
+            a = max(t, math.floor(j * seg_len)); b = end if j == edge.count - 1 else min(end, math.floor((j + 1) * seg_len))
+            if edge.name == 'top': region = desktop[y0 + t:y0 + t + band_px, x0 + a:x0 + b]
+            elif edge.name == 'bottom': region = desktop[y0 + h - t - band_px:y0 + h - t, x0 + a:x0 + b]
+            elif edge.name == 'left': region = desktop[y0 + a:y0 + b, x0 + t:x0 + t + band_px]
+            else: region = desktop[y0 + a:y0 + b, x0 + w - t - band_px:x0 + w - t]
+            expected[edge.order[j]] = tuple(int(c) for c in region.reshape(-1, 3).mean(axis=0))
+    return expected
+
+@pytest.mark.skipif(edge_rgb.np is None, reason="NumPy not installed")
+def test_ambient_reducer_matches_brute_force_mean(tmp_path):
+    np = edge_rgb.np
+    monitors = [FakeMonitor(0, 0, 200, 120, name="A"), FakeMonitor(200, 0, 160, 90, name="B")]
+    desktop = np.random.default_rng(7).integers(0, 256, (120, 360, 3), dtype=np.uint8)
+    np.save(tmp_path / "desktop.npy", desktop)
+    source = edge_rgb.ImageFileSource(str(tmp_path / "desktop.npy"))
+    layouts = {i: MonitorLayout(monitor, 5, 20) for i, monitor in enumerate(monitors)}
+    reducer = edge_rgb.AmbientReducer(layouts, band_px=16, downsample=1)
+    frame = {i: array('l', [0]) * layout.total_segments for i, layout in layouts.items()}
+    reducer.sample(source, frame)
+    for i, layout in layouts.items():
+        expected = brute_force_band_means(desktop, layout, 16)
+        assert len(expected) == layout.total_segments
+        for n, color in enumerate(frame[i]):
+            assert max(abs(a - b) for a, b in zip(unpack(color), expected[n])) <= 1, (i, n)
+
+def test_scheduler_drops_missed_deadlines_without_drift():
+    scheduler = edge_rgb.FrameScheduler(0.25, 0.5) # Binary-exact times keep the arithmetic exact
+    scheduler.start(0.0)
+    assert scheduler.advance(0.125) == (125, 0) and scheduler.deadline == 0.25
+    assert scheduler.lateness(0.375) == 0.125 and scheduler.lateness(0.125) == 0.0
+    assert scheduler.advance(0.875) == (125, 2) # Overran past the 0.5 and 0.75 deadlines: both dropped
+    assert scheduler.deadline == 1.0 and scheduler.dropped_frames == 2
+    assert scheduler.advance(1.2496) == (1, 0) # Never asks after() for a 0 ms delay
+    assert scheduler.hue_at(1.0) == 0.5 # Hue follows the clock, not the frame count
+    scheduler.configure(0.25, 1.0, now=1.0)
+    assert scheduler.hue_at(1.0) == 0.5 and scheduler.hue_at(1.25) == 0.75 # Rate change without a jump
+    scheduler.resume(10.0)
+    assert scheduler.advance(10.125) == (125, 0) and scheduler.dropped_frames == 2 # A suspended loop drops nothing
+
+def test_parse_monitor_selection():
+    monitors = fake_monitors(3) # Monitor 0 is primary
+    parse = edge_rgb.parse_monitor_selection
+    assert parse("all", monitors) == ([0, 1, 2], "all")
+    assert parse("", monitors) == parse(" Primary ", monitors) == ([0], "primary")
+    assert parse("2, 0,,2", monitors) == ([0, 2], "list")
+    for text in ["x", "1,-1", "5", ","]:
+        with pytest.raises(ValueError): parse(text, monitors)
+    assert parse("1,7", monitors, strict=False) == ([1], "list") # Unattended start: missing monitors are skipped
+    with pytest.raises(ValueError): parse("7", monitors, strict=False)
+    with pytest.raises(ValueError): parse("primary", [FakeMonitor(0, 0, 1920, 1080)])
+
+def test_layout_cache_round_trip(tmp_path):
+    path = str(tmp_path / "layouts.json")
+    monitor = FakeMonitor(1920, 0, 2560, 1440, name="FAKE1")
+    cache = edge_rgb.LayoutCache(path)
+    built = cache.get(monitor, 5, 30)
+    assert (cache.hits, cache.misses) == (0, 1)
+    cache.save()
+    reopened = edge_rgb.LayoutCache(path)
+    cached = reopened.get(monitor, 5, 30)
+    assert (reopened.hits, reopened.misses) == (1, 0) and not reopened.dirty
+    assert cached.to_dict() == built.to_dict() == MonitorLayout(monitor, 5, 30).to_dict()
+    assert [edge.rects for edge in cached.edges] == [edge.rects for edge in built.edges]
+    reopened.get(monitor, 6, 30) # Different thickness: a new entry
+    assert (reopened.hits, reopened.misses) == (1, 1) and reopened.dirty
+    (tmp_path / "layouts.json").write_text("{not json")
+    assert edge_rgb.LayoutCache(path).entries == {} # Unreadable file: ignored and rebuilt